@@ -1,26 +1,72 @@
+import time
 import uuid
 
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver  
 
 from langgraph.graph import END, START, StateGraph
-from agent.nodes import orchestration_node
+from agent.nodes import router_node, route_by_tier, casual_node, orchestration_node
 
 from agent.state import AgentState
 from agent.config import settings
+from agent.serde import checkpoint_serde
+from db.pool import db
+from profiling.spans import current_profile
 
 from persistance.fire_and_forget import fire, persist_thread_and_turn, persist_turn_complete
 
 
+_GRAPH_NODES = ("router", "casual", "orchestrator")
+
+
 async def _build_agent_graph():
     """build the agent DAG"""
     graph = StateGraph(AgentState)
+    graph.add_node("router", router_node)
+    graph.add_node("casual", casual_node)
     graph.add_node("orchestrator", orchestration_node)
 
-    graph.add_edge(START, "orchestrator")
+    graph.add_edge(START, "router")
+    graph.add_conditional_edges("router", route_by_tier, ["casual", "orchestrator"])
+    graph.add_edge("casual", END)
     graph.add_edge("orchestrator", END)
     return graph
 
 
+def _turn_metadata(event: dict, turn_started: float, model_started, first_token_at) -> dict:
+    """Token counts and latencies for a finished chat model run (stored on the assistant message)"""
+    ended = time.perf_counter()
+    output = event.get("data", {}).get("output")
+    usage = getattr(output, "usage_metadata", None) or {}
+    event_metadata = event.get("metadata", {})
+    # A hedged request may have been answered by the hedge model
+    response_metadata = getattr(output, "response_metadata", None) or {}
+    return {
+        "model": response_metadata.get("served_model") or event_metadata.get("ls_model_name"),
+        "node": event_metadata.get("langgraph_node"),
+        "prompt_tokens": usage.get("input_tokens"),
+        "completion_tokens": usage.get("output_tokens"),
+        "ttft_ms": round((first_token_at - turn_started) * 1000, 2) if first_token_at else None,
+        "generation_ms": round((ended - (model_started or turn_started)) * 1000, 2),
+        "total_ms": round((ended - turn_started) * 1000, 2),
+    }
+
+
+def _profile_graph_event(profile, kind: str, event: dict, marks: dict):
+    """Per-stage spans for a profiled turn (only called while profiling)"""
+    now = time.perf_counter()
+    name = event.get("name")
+    if name not in _GRAPH_NODES:
+        return
+    if kind == "on_chain_start":
+        if "first_node" not in marks:
+            # Everything before the first node: checkpoint read + graph setup
+            marks["first_node"] = now
+            profile.record("graph.checkpoint_load", marks["stream_started"], now)
+        marks[name] = now
+    elif kind == "on_chain_end" and name in marks:
+        profile.record(f"graph.node.{name}", marks.pop(name), now)
+        marks["last_node_end"] = now
+
 
 async def agent_service(body: dict):
     """Agent service with token-level streaming"""
@@ -28,18 +74,28 @@ async def agent_service(body: dict):
     thread_id = body["thread_id"]
     user_id = body.get("user_id")  # Can be None for anonymous users
     turn_id = uuid.uuid4()
+    assistant_message_id = uuid.uuid4()  # Sent to the client so feedback can reference it
     user_message = body["user_message"]
     should_persist = body.get("persist", True)  # Default to True for backwards compatibility
+    turn_started = time.perf_counter()
+    profile = current_profile()  # None unless this request is being profiled
 
     # Only persist to database for authenticated users
     if should_persist and user_id:
+        # Keep this user's reads on the primary until the background writes land
+        db.note_write(user_id)
         # Fire-and-forget: create thread + turn in single transaction (avoids FK race condition)
         fire(persist_thread_and_turn(thread_id, user_id, turn_id, user_message))
 
-    async with AsyncPostgresSaver.from_conn_string(settings.pg_uri) as checkpointer:  
+    async with AsyncPostgresSaver.from_conn_string(settings.pg_uri, serde=checkpoint_serde) as checkpointer:  
         # await checkpointer.setup()
+        if profile:
+            profile.record("agent.checkpointer_open", turn_started, time.perf_counter())
+        compile_started = time.perf_counter()
         builder = await _build_agent_graph()
         graph = builder.compile(checkpointer=checkpointer)
+        if profile:
+            profile.record("agent.graph_compile", compile_started, time.perf_counter())
         config = {
             "configurable": {
                 "thread_id": thread_id,
@@ -48,6 +104,9 @@ async def agent_service(body: dict):
         }
         
         full_response = ""  # Collect tokens for persistence
+        model_started = None
+        first_token_at = None
+        marks = {"stream_started": time.perf_counter()}
         
         async for event in graph.astream_events(
             {
@@ -61,19 +120,32 @@ async def agent_service(body: dict):
         ):
             # Stream LLM tokens as they're generated
             kind = event.get("event")
-            if kind == "on_chat_model_stream":
+            if profile:
+                _profile_graph_event(profile, kind, event, marks)
+            if kind == "on_chat_model_start":
+                model_started = time.perf_counter()
+            elif kind == "on_chat_model_stream":
                 content = event.get("data", {}).get("chunk", {})
                 if hasattr(content, "content") and content.content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
                     full_response += content.content  # Collect for persistence
                     yield {
                         "type": "token",
                         "content": content.content
                     }
             elif kind == "on_chat_model_end":
+                metadata = _turn_metadata(event, turn_started, model_started, first_token_at)
+                if profile:
+                    now = time.perf_counter()
+                    profile.record("llm.time_to_first_token", model_started or now, first_token_at or now)
+                    profile.record("llm.generation", model_started or now, now)
+
                 # Signal that streaming is complete
                 yield {
                     "type": "end",
-                    "content": ""
+                    "content": "",
+                    "message_id": str(assistant_message_id)
                 }
 
                 # Only persist messages for authenticated users
@@ -83,5 +155,12 @@ async def agent_service(body: dict):
                         thread_id=thread_id,
                         turn_id=turn_id,
                         user_message=user_message,
-                        assistant_message=full_response
+                        assistant_message=full_response,
+                        assistant_message_id=assistant_message_id,
+                        user_id=user_id,
+                        metadata=metadata
                     ))
+
+        if profile and "last_node_end" in marks:
+            # Final checkpoint write happens after the last node finishes
+            profile.record("graph.checkpoint_save", marks["last_node_end"], time.perf_counter())
@@ -14,6 +14,23 @@ class Settings(BaseSettings):
     # OpenAI Configuration
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
     openai_model: str = os.getenv("OPENAI_MODEL", "gpt-5.1")
+    # Cheaper model tier for small talk, and a dedicated model for thread titles
+    openai_fast_model: str = os.getenv("OPENAI_FAST_MODEL", "gpt-5-mini")
+    openai_title_model: str = os.getenv("OPENAI_TITLE_MODEL", "gpt-5-nano")
+    # Point at a local OpenAI-compatible stand-in server for testing
+    openai_base_url: str = os.getenv("OPENAI_BASE_URL", "")
+    # Hedge endpoint/model for slow first tokens (defaults to the primary's)
+    openai_hedge_model: str = os.getenv("OPENAI_HEDGE_MODEL", "")
+    openai_hedge_base_url: str = os.getenv("OPENAI_HEDGE_BASE_URL", "")
+    openai_hedge_api_key: str = os.getenv("OPENAI_HEDGE_API_KEY", "")
+
+    # Shared LLM HTTP client
+    llm_http2: bool = os.getenv("LLM_HTTP2", "true").lower() == "true"
+    llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    llm_max_keepalive_connections: int = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    llm_keepalive_expiry: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+    llm_connect_timeout: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    llm_read_timeout: float = float(os.getenv("LLM_READ_TIMEOUT", "120"))
     
     # Server Configuration
     port: int = int(os.getenv("PORT", "3000"))
@@ -38,8 +55,84 @@ class Settings(BaseSettings):
     temperature: float = 0.7
     max_tokens: int = 1000
 
+    # Optional read replica - GET endpoints are routed here when set
+    pg_read_dsn: str = os.getenv("PG_READ_DSN", "")
+    READ_POOL_MIN_SIZE: int = int(os.getenv("READ_POOL_MIN_SIZE", "5"))
+    READ_POOL_MAX_SIZE: int = int(os.getenv("READ_POOL_MAX_SIZE", "20"))
+    # After a write, that user's reads stay on the primary this long (or until the replica catches up)
+    READ_YOUR_WRITES_WINDOW: float = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+    REPLICA_LSN_CACHE_SECONDS: float = float(os.getenv("REPLICA_LSN_CACHE_SECONDS", "0.05"))
+
     pg_uri: str = f"postgresql://{pg_user}:{pg_password}@{pg_host}:{pg_port}/{pg_dbname}?sslmode=require"
     CHECKPOINT_TTL: int = 60 * 60 * 24 * 30 # 30 days
+    # Checkpoint blobs: "zstd" compresses payloads above the threshold, "none" writes plain msgpack
+    CHECKPOINT_COMPRESSION: str = os.getenv("CHECKPOINT_COMPRESSION", "zstd")
+    CHECKPOINT_COMPRESS_MIN_BYTES: int = int(os.getenv("CHECKPOINT_COMPRESS_MIN_BYTES", "4096"))
+    CHECKPOINT_ZSTD_LEVEL: int = int(os.getenv("CHECKPOINT_ZSTD_LEVEL", "3"))
+
+    # Hedged requests on the full tier: race a second request when the first token is slow
+    HEDGE_ENABLED: bool = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+    HEDGE_AFTER_MS: float = float(os.getenv("HEDGE_AFTER_MS", "2000"))
+    HEDGE_MAX_RATE: float = float(os.getenv("HEDGE_MAX_RATE", "0.05"))  # hedges per request, long run
+    HEDGE_BURST: float = float(os.getenv("HEDGE_BURST", "5"))
+
+    # Turns longer than this never go to the fast tier
+    ROUTER_FAST_MAX_WORDS: int = int(os.getenv("ROUTER_FAST_MAX_WORDS", "12"))
+
+    # In-process LRU for public share snapshots
+    SHARE_CACHE_MAX_ENTRIES: int = int(os.getenv("SHARE_CACHE_MAX_ENTRIES", "2048"))
+    SHARE_CACHE_MAX_BYTES: int = int(os.getenv("SHARE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+    # Feedback ingestion buffer
+    FEEDBACK_FLUSH_BATCH_SIZE: int = int(os.getenv("FEEDBACK_FLUSH_BATCH_SIZE", "500"))
+    FEEDBACK_FLUSH_INTERVAL: float = float(os.getenv("FEEDBACK_FLUSH_INTERVAL", "1.0"))
+    FEEDBACK_MAX_PENDING: int = int(os.getenv("FEEDBACK_MAX_PENDING", "50000"))
+
+    # Idempotency-Key results are kept this long for replay to retried requests
+    IDEMPOTENCY_TTL: int = int(os.getenv("IDEMPOTENCY_TTL", str(60 * 10)))
+    IDEMPOTENCY_MAX_RUNS: int = int(os.getenv("IDEMPOTENCY_MAX_RUNS", "5000"))
+
+    # Shared secret for admin endpoints (X-Admin-Key header); empty disables them
+    ADMIN_API_KEY: str = os.getenv("ADMIN_API_KEY", "")
+
+    # Partition / archive maintenance (seconds between runs; 0 disables the background task)
+    MAINTENANCE_INTERVAL: int = int(os.getenv("MAINTENANCE_INTERVAL", str(60 * 60)))
+    PARTITION_MONTHS_AHEAD: int = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+    ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+    ARCHIVE_BATCH_SIZE: int = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+
+    # WebSocket chat transport
+    WS_AUTH_TIMEOUT: float = float(os.getenv("WS_AUTH_TIMEOUT", "10"))
+    WS_TURN_WINDOW: int = int(os.getenv("WS_TURN_WINDOW", "256"))  # unacked chunks per turn
+    WS_MAX_ACTIVE_TURNS: int = int(os.getenv("WS_MAX_ACTIVE_TURNS", "8"))
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "512"))
+
+    # Retrieval memory (opt-in): instead of the full thread, send system prompt +
+    # top-k past turns + recent messages
+    MEMORY_ENABLED: bool = os.getenv("MEMORY_ENABLED", "false").lower() == "true"
+    MEMORY_RECENT_MESSAGES: int = int(os.getenv("MEMORY_RECENT_MESSAGES", "8"))
+    MEMORY_TOP_K: int = int(os.getenv("MEMORY_TOP_K", "4"))
+    MEMORY_MIN_SCORE: float = float(os.getenv("MEMORY_MIN_SCORE", "0.15"))
+    MEMORY_DIM: int = int(os.getenv("MEMORY_DIM", "256"))
+    MEMORY_MAX_USERS: int = int(os.getenv("MEMORY_MAX_USERS", "1000"))
+    MEMORY_MAX_ENTRIES: int = int(os.getenv("MEMORY_MAX_ENTRIES", "1000"))  # per user
+    MEMORY_MAX_BYTES: int = int(os.getenv("MEMORY_MAX_BYTES", str(256 * 1024 * 1024)))
+    MEMORY_SNIPPET_CHARS: int = int(os.getenv("MEMORY_SNIPPET_CHARS", "1000"))
+
+    # Large chat messages are stored zstd-compressed ("none" writes plain text; reads always decode)
+    MESSAGE_COMPRESSION: str = os.getenv("MESSAGE_COMPRESSION", "zstd")
+    MESSAGE_COMPRESS_MIN_BYTES: int = int(os.getenv("MESSAGE_COMPRESS_MIN_BYTES", "2048"))
+    MESSAGE_ZSTD_LEVEL: int = int(os.getenv("MESSAGE_ZSTD_LEVEL", "6"))
+    # Optional trained dictionary (scripts/train_message_dictionary.py)
+    MESSAGE_ZSTD_DICT_PATH: str = os.getenv("MESSAGE_ZSTD_DICT_PATH", "")
+
+    # Opt-in per-request profiling (middleware is only installed when enabled).
+    # A request is profiled when its X-Profile-Key header matches PROFILE_SECRET, or when sampled.
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILE_SECRET: str = os.getenv("PROFILE_SECRET", "")
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_MAX_FILES: int = int(os.getenv("PROFILE_MAX_FILES", "200"))
 
     ANONYMOUS_DAILY_LIMIT: int = 40
     SCHEMA: str = "orion"
@@ -0,0 +1,36 @@
+"""
+In-process per-user event bus for server push (e.g. thread title updates).
+"""
+import asyncio
+from typing import Dict, Set
+
+
+class UserEvents:
+    """Fan out events to every open connection of a user. Slow consumers drop events."""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, user_id) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(str(user_id), set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue: asyncio.Queue):
+        queues = self._subscribers.get(str(user_id))
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[str(user_id)]
+
+    def publish(self, user_id, event: dict):
+        for queue in self._subscribers.get(str(user_id), ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                pass
+
+
+user_events = UserEvents()
@@ -0,0 +1,203 @@
+"""
+Hedged LLM requests - cut tail time-to-first-token.
+
+HedgedChatModel wraps a primary and a hedge chat model. A turn starts on the
+primary; if no content token has arrived after HEDGE_AFTER_MS, the same
+request is sent to the hedge (another endpoint and/or model). Whichever
+produces a content token first is streamed, and the other request is
+cancelled.
+
+Hedges are capped by a token-bucket budget: every request earns
+HEDGE_MAX_RATE of a hedge, so at most that fraction of requests (plus a small
+burst) are ever duplicated, even during a provider-wide slowdown.
+
+The inner models are driven without callbacks, so astream_events only sees the
+wrapper's run: the loser never leaks tokens to the client, and the usual
+on_chat_model_start/stream/end events still fire for the winner.
+
+Try it against two local stand-in servers with injected delays:
+
+    python scripts/stub_llm_server.py --port 9000 --first-token-delay 5 --name slow
+    python scripts/stub_llm_server.py --port 9001 --first-token-delay 0.2 --name fast
+    HEDGE_ENABLED=true HEDGE_AFTER_MS=500 OPENAI_API_KEY=stub \
+        OPENAI_BASE_URL=http://127.0.0.1:9000/v1 OPENAI_HEDGE_BASE_URL=http://127.0.0.1:9001/v1 \
+        uvicorn main:app
+"""
+import asyncio
+import threading
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from agent.config import settings
+
+_DONE = object()
+
+
+class HedgeBudget:
+    """Token bucket: each request earns `rate` of a hedge, each hedge spends one"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.rate)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class HedgeStats:
+    """In-process counters for hedged requests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedges_fired = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0  # primary still won after a hedge was fired
+        self.budget_denied = 0
+        self.failovers = 0  # winner errored before streaming, the other leg took over
+
+    def incr(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": settings.HEDGE_ENABLED,
+                "after_ms": settings.HEDGE_AFTER_MS,
+                "max_rate": settings.HEDGE_MAX_RATE,
+                "requests": self.requests,
+                "hedges_fired": self.hedges_fired,
+                "hedge_rate": round(self.hedges_fired / self.requests, 4) if self.requests else 0.0,
+                "hedge_wins": self.hedge_wins,
+                "primary_wins": self.primary_wins,
+                "budget_denied": self.budget_denied,
+                "failovers": self.failovers,
+            }
+
+
+hedge_budget = HedgeBudget(rate=settings.HEDGE_MAX_RATE, burst=settings.HEDGE_BURST)
+hedge_stats = HedgeStats()
+
+
+class _Leg:
+    """One in-flight request; buffers its chunks and signals the first content token"""
+
+    def __init__(self, name: str, model: BaseChatModel, messages, stop, kwargs):
+        self.name = name
+        self.model = model
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.started = asyncio.Event()  # first content token, end of stream, or error
+        self.failed = False
+        self.task = asyncio.create_task(self._run(messages, stop, kwargs))
+
+    async def _run(self, messages, stop, kwargs):
+        try:
+            async for chunk in self.model._astream(messages, stop=stop, **kwargs):
+                self.queue.put_nowait(chunk)
+                if chunk.message.content:
+                    self.started.set()
+            self.queue.put_nowait(_DONE)
+        except Exception as e:
+            self.failed = True
+            self.queue.put_nowait(e)
+        finally:
+            self.started.set()
+
+
+async def _first(*legs: _Leg) -> _Leg:
+    """Wait until one of the legs starts; ties go to the earlier leg"""
+    waiters = [asyncio.ensure_future(leg.started.wait()) for leg in legs]
+    try:
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+    return next(leg for leg in legs if leg.started.is_set())
+
+
+class HedgedChatModel(BaseChatModel):
+    """Streams from `primary`, racing `hedge` when the first token is slow"""
+
+    primary: BaseChatModel
+    hedge: BaseChatModel
+    model_name: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged"
+
+    def _get_ls_params(self, stop: Optional[List[str]] = None, **kwargs: Any):
+        return self.primary._get_ls_params(stop=stop, **kwargs)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        # Only the async streaming path is hedged
+        return self.primary._generate(messages, stop=stop, **kwargs)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        hedge_stats.incr("requests")
+        hedge_budget.earn()
+        primary = _Leg("primary", self.primary, messages, stop, kwargs)
+        legs = [primary]
+        try:
+            waiter = asyncio.ensure_future(primary.started.wait())
+            done, _ = await asyncio.wait([waiter], timeout=settings.HEDGE_AFTER_MS / 1000)
+            waiter.cancel()
+            if done:
+                winner = primary
+            elif not hedge_budget.try_spend():
+                hedge_stats.incr("budget_denied")
+                await primary.started.wait()
+                winner = primary
+            else:
+                hedge_stats.incr("hedges_fired")
+                hedge = _Leg("hedge", self.hedge, messages, stop, kwargs)
+                legs.append(hedge)
+                winner = await _first(primary, hedge)
+                other = hedge if winner is primary else primary
+                if winner.failed:
+                    await other.started.wait()
+                    if not other.failed:
+                        hedge_stats.incr("failovers")
+                        winner = other
+                hedge_stats.incr("hedge_wins" if winner is hedge else "primary_wins")
+
+            for leg in legs:
+                if leg is not winner:
+                    leg.task.cancel()
+
+            first = True
+            while True:
+                item = await winner.queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                if first:
+                    # Recorded once (response_metadata strings concatenate when chunks merge)
+                    item.message.response_metadata["served_by"] = winner.name
+                    item.message.response_metadata["served_model"] = winner.model.model_name
+                    first = False
+                yield item
+        finally:
+            for leg in legs:
+                leg.task.cancel()
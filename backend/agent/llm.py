@@ -0,0 +1,98 @@
+"""
+Shared LLM client factory.
+
+Every ChatOpenAI instance in the app is built here so that chat and title
+traffic share one tuned async HTTP client (pool limits, keep-alive, timeouts,
+HTTP/2) instead of each model opening its own connections.
+"""
+from typing import Optional
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from agent.config import settings
+
+
+class _ClientStats:
+    """Connection reuse counters, fed by httpcore trace events"""
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+
+    def snapshot(self) -> dict:
+        reused = max(self.requests - self.new_connections, 0)
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+        }
+
+
+_stats = _ClientStats()
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+async def _trace(event_name: str, info: dict):
+    """httpcore trace hook - counts requests and freshly opened connections"""
+    if event_name == "connection.connect_tcp.complete":
+        _stats.new_connections += 1
+    elif event_name.endswith("send_request_headers.started"):
+        _stats.requests += 1
+
+
+async def _attach_trace(request: httpx.Request):
+    request.extensions["trace"] = _trace
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide async HTTP client used for all LLM calls"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=settings.llm_http2,
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_keepalive_connections,
+                keepalive_expiry=settings.llm_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                settings.llm_read_timeout,
+                connect=settings.llm_connect_timeout,
+            ),
+            event_hooks={"request": [_attach_trace]},
+        )
+    return _http_client
+
+
+def get_llm(model: Optional[str] = None, **kwargs) -> ChatOpenAI:
+    """Build a ChatOpenAI bound to the shared HTTP client"""
+    params = {
+        "model": model or settings.openai_model,
+        "temperature": settings.temperature,
+        "api_key": settings.openai_api_key,
+        "streaming": True,
+        "http_async_client": get_http_client(),
+    }
+    if settings.openai_base_url:
+        params["base_url"] = settings.openai_base_url
+    params.update(kwargs)
+    return ChatOpenAI(**params)
+
+
+def get_llm_client_stats() -> dict:
+    """Connection reuse stats for the shared LLM HTTP client"""
+    return {
+        "http2": settings.llm_http2,
+        "max_connections": settings.llm_max_connections,
+        **_stats.snapshot(),
+    }
+
+
+async def close_llm_client():
+    """Close the shared HTTP client (called on app shutdown)"""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
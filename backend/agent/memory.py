@@ -0,0 +1,226 @@
+"""
+Per-user vector memory - retrieval of relevant past turns.
+
+Instead of replaying a whole long thread into the prompt, the answer nodes
+send the system prompt, the top-k past turns most similar to the new message
+(from any of the user's threads), and only the most recent messages.
+
+  * Embedder - pluggable; HashingEmbedder is local, deterministic and needs
+    no model or network (signed feature hashing over words and bigrams).
+  * UserIndex - one float32 matrix per user, grown by doubling and capped;
+    once full it overwrites the oldest entries (ring buffer).
+  * MemoryStore - LRU over users, bounded by MEMORY_MAX_USERS and by
+    MEMORY_MAX_BYTES (vectors + snippet text); least recently used users
+    are dropped first.
+
+The index is in-process and rebuilt incrementally: new turns are added by
+persist_turn_complete, and a thread seen for the first time since startup is
+indexed from its checkpointed messages.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agent.config import settings
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class Embedder:
+    """Maps texts to L2-normalized float32 vectors of size `dim`"""
+
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """Signed feature hashing of unigrams and bigrams (stable across processes)"""
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN.findall(text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[row, digest % self.dim] += 1.0 if (digest >> 63) & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+def turn_snippet(user_message: str, assistant_message: str) -> str:
+    """Text stored (and shown to the model) for one past turn"""
+    snippet = f"User: {user_message}\nAssistant: {assistant_message}"
+    limit = settings.MEMORY_SNIPPET_CHARS
+    return snippet if len(snippet) <= limit else snippet[:limit] + "..."
+
+
+def turn_key(thread_id: str, user_message: str) -> str:
+    """Identifies a turn so retrieval can skip turns already in the recent window"""
+    return hashlib.blake2b(f"{thread_id}\x00{user_message}".encode("utf-8"), digest_size=8).hexdigest()
+
+
+class UserIndex:
+    """One user's snippets and their embeddings"""
+
+    def __init__(self, dim: int, max_entries: int):
+        self.max_entries = max_entries
+        self.vectors = np.zeros((min(16, max_entries), dim), dtype=np.float32)
+        self.snippets: List[str] = []
+        self.keys: List[str] = []
+        self.threads: set = set()
+        self.snippet_bytes = 0
+        self.count = 0
+        self._next = 0  # write position once the ring is full
+
+    def add(self, vectors: np.ndarray, snippets: List[str], keys: List[str]):
+        for vector, snippet, key in zip(vectors, snippets, keys):
+            if self.count < self.max_entries:
+                if self.count == len(self.vectors):
+                    grown = np.zeros((min(len(self.vectors) * 2, self.max_entries), self.vectors.shape[1]), dtype=np.float32)
+                    grown[:self.count] = self.vectors[:self.count]
+                    self.vectors = grown
+                slot = self.count
+                self.snippet_bytes += len(snippet)
+                self.snippets.append(snippet)
+                self.keys.append(key)
+                self.count += 1
+            else:
+                slot = self._next
+                self.snippet_bytes += len(snippet) - len(self.snippets[slot])
+                self.snippets[slot] = snippet
+                self.keys[slot] = key
+                self._next = (self._next + 1) % self.max_entries
+            self.vectors[slot] = vector
+
+    def search(self, query: np.ndarray, k: int, min_score: float, exclude: set) -> List[Tuple[float, str]]:
+        if self.count == 0:
+            return []
+        scores = self.vectors[:self.count] @ query
+        # Over-fetch so excluded (recent) turns don't starve the result
+        candidates = min(self.count, k + len(exclude))
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        results = []
+        for slot in top[np.argsort(-scores[top])]:
+            if scores[slot] < min_score:
+                break
+            if self.keys[slot] in exclude:
+                continue
+            results.append((float(scores[slot]), self.snippets[slot]))
+            if len(results) == k:
+                break
+        return results
+
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.snippet_bytes
+
+
+class MemoryStore:
+    """LRU-bounded collection of per-user indexes with latency/size stats"""
+
+    def __init__(self, embedder: Embedder, max_users: int, max_entries: int, max_bytes: int):
+        self.embedder = embedder
+        self.max_users = max_users
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._bytes = 0
+        self._users: "OrderedDict[str, UserIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._query_ms: deque = deque(maxlen=1024)
+        self.queries = 0
+        self.added = 0
+        self.evicted_users = 0
+
+    def _index(self, user_id: str, create: bool) -> Optional[UserIndex]:
+        index = self._users.get(user_id)
+        if index is not None:
+            self._users.move_to_end(user_id)
+        elif create:
+            index = self._users[user_id] = UserIndex(self.embedder.dim, self.max_entries)
+            self._bytes += index.nbytes()
+            self._evict()
+        return index
+
+    def _evict(self):
+        # Never evicts the most recently used user (the one being written)
+        while len(self._users) > 1 and (len(self._users) > self.max_users or self._bytes > self.max_bytes):
+            _, index = self._users.popitem(last=False)
+            self._bytes -= index.nbytes()
+            self.evicted_users += 1
+
+    def knows_thread(self, user_id: str, thread_id: str) -> bool:
+        with self._lock:
+            index = self._users.get(str(user_id))
+            return index is not None and str(thread_id) in index.threads
+
+    def add_turns(self, user_id: str, thread_id: str, turns: List[Tuple[str, str]]):
+        """Index (user_message, assistant_message) pairs from one thread"""
+        thread_id = str(thread_id)
+        if not turns:
+            with self._lock:
+                self._index(str(user_id), create=True).threads.add(thread_id)
+            return
+        snippets = [turn_snippet(u, a) for u, a in turns]
+        keys = [turn_key(thread_id, u) for u, _ in turns]
+        # Embed the raw text; the "User:/Assistant:" labels would match every query
+        vectors = self.embedder.embed([f"{u}\n{a}" for u, a in turns])
+        with self._lock:
+            index = self._index(str(user_id), create=True)
+            before = index.nbytes()
+            index.add(vectors, snippets, keys)
+            index.threads.add(thread_id)
+            self._bytes += index.nbytes() - before
+            self.added += len(snippets)
+            self._evict()
+
+    def search(self, user_id: str, query: str, exclude: set = frozenset()) -> List[str]:
+        """Top-k snippets for `query` from all of the user's threads, best first"""
+        started = time.perf_counter()
+        vector = self.embedder.embed([query])[0]
+        with self._lock:
+            index = self._index(str(user_id), create=False)
+            results = [] if index is None else index.search(
+                vector, settings.MEMORY_TOP_K, settings.MEMORY_MIN_SCORE, exclude
+            )
+            self.queries += 1
+            self._query_ms.append((time.perf_counter() - started) * 1000)
+        return [snippet for _, snippet in results]
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._query_ms)
+            return {
+                "users": len(self._users),
+                "entries": sum(index.count for index in self._users.values()),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_users": self.max_users,
+                "max_entries_per_user": self.max_entries,
+                "dim": self.embedder.dim,
+                "added": self.added,
+                "evicted_users": self.evicted_users,
+                "queries": self.queries,
+                "query_p50_ms": round(latencies[len(latencies) // 2], 3) if latencies else None,
+                "query_p99_ms": round(latencies[int(len(latencies) * 0.99)], 3) if latencies else None,
+            }
+
+
+memory_store = MemoryStore(
+    HashingEmbedder(settings.MEMORY_DIM),
+    max_users=settings.MEMORY_MAX_USERS,
+    max_entries=settings.MEMORY_MAX_ENTRIES,
+    max_bytes=settings.MEMORY_MAX_BYTES
+)
@@ -1,22 +1,86 @@
+import asyncio
+import time
+
 from agent.state import AgentState
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from langchain_openai import ChatOpenAI
 
 from agent.config import settings
+from agent.llm import get_llm
+from agent.hedge import HedgedChatModel
+from agent.memory import memory_store, turn_key
+from agent.router import FAST_TIER, FULL_TIER, classify_turn, model_for_tier, tier_stats
 
 from agent.prompt import orion
 
-llm = ChatOpenAI(
-        model=settings.openai_model,
-        temperature=settings.temperature,
-        api_key=settings.openai_api_key,
-        streaming=True
+llm = get_llm(stream_usage=True)
+if settings.HEDGE_ENABLED:
+    hedge_params = {"stream_usage": True}
+    if settings.openai_hedge_base_url:
+        hedge_params["base_url"] = settings.openai_hedge_base_url
+    if settings.openai_hedge_api_key:
+        hedge_params["api_key"] = settings.openai_hedge_api_key
+    llm = HedgedChatModel(
+        primary=llm,
+        hedge=get_llm(settings.openai_hedge_model or None, **hedge_params),
+        model_name=llm.model_name
     )
+fast_llm = get_llm(model_for_tier(FAST_TIER), stream_usage=True)
 
 
-async def orchestration_node(state: AgentState):
-    """orchestration node - makes an LLM call and returns the response with streaming"""
-    # Initialize LangChain ChatOpenAI with streaming enabled
+def router_node(state: AgentState):
+    """router node - classifies the turn locally and picks a model tier"""
+    return {"tier": classify_turn(state.get("user_message", ""))}
+
+
+def route_by_tier(state: AgentState) -> str:
+    """conditional edge - maps the chosen tier to the node that answers it"""
+    return "casual" if state.get("tier") == FAST_TIER else "orchestrator"
+
+
+def _turn_pairs(history: list) -> list:
+    """(user_message, assistant_message) pairs from a thread's message history"""
+    pairs = []
+    for question, answer in zip(history, history[1:]):
+        if isinstance(question, HumanMessage) and isinstance(answer, AIMessage):
+            pairs.append((question.content, answer.content))
+    return pairs
+
+
+async def _with_memory(state: AgentState, messages: list) -> list:
+    """
+    Model input for a signed-in user: system prompt, the most relevant past
+    turns (any thread), then only the recent window of this thread.
+    The thread's full history stays in state; only the prompt is trimmed.
+    """
+    user_id = state.get("user_id")
+    thread_id = str(state.get("thread_id"))
+    if not settings.MEMORY_ENABLED or not user_id or user_id == "anonymous":
+        return messages
+
+    system = messages[:1] if isinstance(messages[0], SystemMessage) else []
+    history, question = messages[len(system):-1], messages[-1]
+
+    # First turn on this thread since startup: index what the checkpoint already holds
+    if not memory_store.knows_thread(user_id, thread_id):
+        await asyncio.to_thread(memory_store.add_turns, user_id, thread_id, _turn_pairs(history))
+
+    recent = history[-settings.MEMORY_RECENT_MESSAGES:]
+    exclude = {turn_key(thread_id, m.content) for m in recent if isinstance(m, HumanMessage)}
+    snippets = await asyncio.to_thread(memory_store.search, user_id, question.content, exclude)
+    if not snippets and len(recent) == len(history):
+        return messages
+
+    context = []
+    if snippets:
+        context = [SystemMessage(content=(
+            "Relevant excerpts from earlier conversations with this user "
+            "(use them only if they help answer):\n\n" + "\n\n---\n\n".join(snippets)
+        ))]
+    return [*system, *context, *recent, question]
+
+
+async def _respond(state: AgentState, model, tier: str):
+    """shared answer step for both tiers - streams the LLM and records per-tier usage"""
     existing_messages = state.get("messages", [])
 
     if not existing_messages:
@@ -26,16 +90,45 @@ async def orchestration_node(state: AgentState):
     else:
         messages = existing_messages
 
-    user_message = state.get("user_message", "")    
+    user_message = state.get("user_message", "")
     messages.append(HumanMessage(content=user_message))
-    
+    model_input = await _with_memory(state, messages)
+
     # Stream the response
+    start_time = time.perf_counter()
     full_response = ""
-    async for chunk in llm.astream(messages):
+    aggregate = None
+    async for chunk in model.astream(model_input):
         full_response += chunk.content
+        aggregate = chunk if aggregate is None else aggregate + chunk
+    latency_ms = (time.perf_counter() - start_time) * 1000
+
+    usage = (aggregate.usage_metadata if aggregate is not None else None) or {}
+    turn_usage = {
+        "tier": tier,
+        "model": model.model_name,
+        "latency_ms": round(latency_ms, 2),
+        "prompt_tokens": usage.get("input_tokens"),
+        "completion_tokens": usage.get("output_tokens"),
+    }
+    tier_stats.record(
+        tier, model.model_name, latency_ms,
+        turn_usage["prompt_tokens"], turn_usage["completion_tokens"]
+    )
 
     messages.append(AIMessage(content=full_response))
 
     return {
-        "messages": messages
-    }
\ No newline at end of file
+        "messages": messages,
+        "turn_usage": turn_usage
+    }
+
+
+async def orchestration_node(state: AgentState):
+    """orchestration node - makes an LLM call on the full model and returns the response with streaming"""
+    return await _respond(state, llm, FULL_TIER)
+
+
+async def casual_node(state: AgentState):
+    """casual node - answers small talk on the fast model tier"""
+    return await _respond(state, fast_llm, FAST_TIER)
@@ -0,0 +1,90 @@
+"""
+Turn routing - decides which model tier answers a turn.
+
+Classification is a local heuristic (no LLM call), so routing adds no
+latency: short small talk goes to the fast tier, everything else to the
+full model.
+"""
+import re
+import threading
+from typing import Optional
+
+from agent.config import settings
+
+FAST_TIER = "fast"
+FULL_TIER = "full"
+
+_SMALL_TALK_PHRASE = (
+    r"(hi|hii+|hello|hey|yo|sup|hola|thanks|thank you|thx|ty|ok|okay|cool|nice|great|"
+    r"good (morning|afternoon|evening|night)|bye|goodbye|see you|lol|haha|how are you|"
+    r"who are you|what'?s up|there|again|so much|a lot|orion)"
+)
+# The whole message must be small talk ("ok thanks!", "hi there 👋") - a
+# greeting followed by a real question ("hi, what is ...") is not
+_SMALL_TALK = re.compile(
+    rf"{_SMALL_TALK_PHRASE}(\W+{_SMALL_TALK_PHRASE})*\W*",
+    re.IGNORECASE,
+)
+# Signals that a turn needs the full model even if it is short
+_COMPLEX_HINTS = re.compile(
+    r"```|\b(code|explain|why|how do|how to|compare|analy[sz]e|write|debug|error|"
+    r"implement|calculate|prove|summari[sz]e|translate|plan)\b",
+    re.IGNORECASE,
+)
+
+
+def classify_turn(user_message: str) -> str:
+    """Return FAST_TIER for trivial small talk, FULL_TIER otherwise"""
+    text = (user_message or "").strip()
+    if not text:
+        return FAST_TIER
+    if len(text.split()) > settings.ROUTER_FAST_MAX_WORDS or "\n" in text:
+        return FULL_TIER
+    if _COMPLEX_HINTS.search(text):
+        return FULL_TIER
+    if _SMALL_TALK.fullmatch(text):
+        return FAST_TIER
+    return FULL_TIER
+
+
+def model_for_tier(tier: str) -> str:
+    return settings.openai_fast_model if tier == FAST_TIER else settings.openai_model
+
+
+class TierStats:
+    """In-process per-tier latency and token counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers: dict = {}
+
+    def record(self, tier: str, model: str, latency_ms: float,
+               prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+        with self._lock:
+            entry = self._tiers.setdefault(tier, {
+                "model": model,
+                "turns": 0,
+                "total_latency_ms": 0.0,
+                "max_latency_ms": 0.0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+            })
+            entry["model"] = model
+            entry["turns"] += 1
+            entry["total_latency_ms"] += latency_ms
+            entry["max_latency_ms"] = max(entry["max_latency_ms"], latency_ms)
+            entry["prompt_tokens"] += prompt_tokens or 0
+            entry["completion_tokens"] += completion_tokens or 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                tier: {
+                    **entry,
+                    "avg_latency_ms": round(entry["total_latency_ms"] / entry["turns"], 2),
+                }
+                for tier, entry in self._tiers.items()
+            }
+
+
+tier_stats = TierStats()
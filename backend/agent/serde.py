@@ -0,0 +1,56 @@
+"""
+Checkpoint serializer - msgpack with zstd compression for large payloads.
+
+LangGraph's JsonPlusSerializer already encodes channel values with msgpack;
+for long threads the `messages` blob is rewritten on every turn and is mostly
+repetitive text, so payloads above CHECKPOINT_COMPRESS_MIN_BYTES are zstd
+compressed and stored under a "<type>+zstd" type tag.
+
+Backward compatible: rows written before this (plain "msgpack"/"json" tags)
+load unchanged. Not forward compatible: a build without this serializer
+can't read "+zstd" rows, so set CHECKPOINT_COMPRESSION=none before rolling back.
+"""
+from typing import Any, Tuple
+
+import zstandard
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from agent.config import settings
+
+ZSTD_SUFFIX = "+zstd"
+
+
+class CompressedSerializer(JsonPlusSerializer):
+    """JsonPlusSerializer that zstd-compresses payloads above a size threshold"""
+
+    def __init__(self, *, min_bytes: int = 4096, level: int = 3, compress: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self.min_bytes = min_bytes
+        self.level = level
+        self.compress = compress
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = super().dumps_typed(obj)
+        if self.compress and type_ != "null" and len(data) >= self.min_bytes:
+            # Compressor objects aren't thread safe; creating one is cheap
+            return type_ + ZSTD_SUFFIX, zstandard.ZstdCompressor(level=self.level).compress(data)
+        return type_, data
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith(ZSTD_SUFFIX):
+            type_ = type_[:-len(ZSTD_SUFFIX)]
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        return super().loads_typed((type_, payload))
+
+
+def get_checkpoint_serde() -> JsonPlusSerializer:
+    """Serializer passed to the checkpointer, per CHECKPOINT_COMPRESSION"""
+    return CompressedSerializer(
+        min_bytes=settings.CHECKPOINT_COMPRESS_MIN_BYTES,
+        level=settings.CHECKPOINT_ZSTD_LEVEL,
+        compress=settings.CHECKPOINT_COMPRESSION == "zstd",
+    )
+
+
+checkpoint_serde = get_checkpoint_serde()
@@ -9,6 +9,8 @@ class AgentState(MessagesState):
     turn_id: str
     user_message: str
     messages: List[BaseMessage]
+    tier: str
+    turn_usage: Dict
 
 
 class CasualConversationState(MessagesState):
@@ -0,0 +1,165 @@
+"""
+Turn runs - idempotency keys and per-thread single-flight for chat turns.
+
+Each chat turn runs agent_service in a background task that publishes its
+chunks to a TurnRun. Clients subscribe to the run instead of driving the
+generator themselves, so:
+  * a retried request with the same Idempotency-Key attaches to the run
+    (replaying what was already streamed) instead of starting a new one,
+  * a retry after completion gets the stored result back,
+  * reusing a key for a different request (other message or thread) is
+    rejected instead of returning the other request's answer,
+  * turns on the same thread_id are serialized by a per-thread lock, so two
+    runs never interleave on one checkpoint.
+State is per process.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from agent.builder import agent_service
+from agent.config import settings
+
+
+class IdempotencyKeyReused(Exception):
+    """An idempotency key was sent again with a different request body"""
+
+
+def request_fingerprint(thread_id: Optional[str], message: str) -> str:
+    """Hash of the client-supplied request fields a key must keep matching"""
+    return hashlib.sha256(json.dumps([thread_id, message]).encode("utf-8")).hexdigest()
+
+
+def _compact(chunks: List[dict]) -> List[dict]:
+    """Collapse consecutive token chunks so stored results stay small"""
+    compacted: List[dict] = []
+    for chunk in chunks:
+        if chunk.get("type") == "token" and compacted and compacted[-1].get("type") == "token":
+            compacted[-1] = {**compacted[-1], "content": compacted[-1]["content"] + chunk["content"]}
+        else:
+            compacted.append(chunk)
+    return compacted
+
+
+class TurnRun:
+    """One agent_service run whose chunks can be replayed to any number of subscribers"""
+
+    def __init__(self, key: Optional[str], thread_id: str, fingerprint: Optional[str] = None):
+        self.key = key
+        self.thread_id = thread_id
+        self.fingerprint = fingerprint
+        self.chunks: List[dict] = []
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, chunk: dict):
+        async with self._changed:
+            self.chunks.append(chunk)
+            self._changed.notify_all()
+
+    async def finish(self):
+        async with self._changed:
+            # Swap in a compacted copy; live subscribers keep reading the original list
+            self.chunks = _compact(self.chunks)
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[dict]:
+        """Yield every chunk from the start of the run, then follow it live until it ends"""
+        chunks = self.chunks
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.done or index < len(chunks))
+                batch = chunks[index:]
+                index = len(chunks)
+                finished = self.done
+            for chunk in batch:
+                yield chunk
+            if finished:
+                return
+
+
+class TurnRegistry:
+    """Tracks in-flight and recently completed turn runs, plus per-thread locks"""
+
+    def __init__(self, ttl: float, max_runs: int):
+        self.ttl = ttl
+        self.max_runs = max_runs
+        self._runs: Dict[str, TurnRun] = {}
+        self._thread_locks: Dict[str, asyncio.Lock] = {}
+        self._thread_waiters: Dict[str, int] = {}
+        self._tasks = set()  # strong refs so running turns aren't garbage collected
+
+    def _expired(self, run: TurnRun) -> bool:
+        return run.done and time.monotonic() - run.finished_at > self.ttl
+
+    def _prune(self):
+        for key in [k for k, run in self._runs.items() if self._expired(run)]:
+            del self._runs[key]
+        # Still too many: drop the oldest completed runs first
+        if len(self._runs) > self.max_runs:
+            completed = sorted(
+                (run for run in self._runs.values() if run.done),
+                key=lambda run: run.finished_at
+            )
+            for run in completed[:len(self._runs) - self.max_runs]:
+                del self._runs[run.key]
+
+    def get(self, key: Optional[str], fingerprint: Optional[str] = None) -> Optional[TurnRun]:
+        """
+        Return the in-flight or stored run for an idempotency key.
+        Raises IdempotencyKeyReused if the run was started for a different request.
+        """
+        if key is None:
+            return None
+        run = self._runs.get(key)
+        if run is not None and self._expired(run):
+            del self._runs[key]
+            return None
+        if run is not None and run.fingerprint != fingerprint:
+            raise IdempotencyKeyReused(key)
+        return run
+
+    def start(self, key: Optional[str], body: dict, fingerprint: Optional[str] = None) -> TurnRun:
+        """Start a run in the background (or return the existing one for this key)"""
+        existing = self.get(key, fingerprint)
+        if existing is not None:
+            return existing
+
+        run = TurnRun(key, body["thread_id"], fingerprint)
+        if key is not None:
+            self._prune()
+            self._runs[key] = run
+        run.task = asyncio.create_task(self._drive(run, body))
+        self._tasks.add(run.task)
+        run.task.add_done_callback(self._tasks.discard)
+        return run
+
+    async def _drive(self, run: TurnRun, body: dict):
+        thread_id = run.thread_id
+        lock = self._thread_locks.setdefault(thread_id, asyncio.Lock())
+        self._thread_waiters[thread_id] = self._thread_waiters.get(thread_id, 0) + 1
+        try:
+            async with lock:
+                async for chunk in agent_service(body):
+                    await run.publish(chunk)
+        except Exception as e:
+            await run.publish({"type": "error", "error": str(e)})
+            # Don't store failures - a retry with the same key should run again
+            if run.key is not None and self._runs.get(run.key) is run:
+                del self._runs[run.key]
+        finally:
+            self._thread_waiters[thread_id] -= 1
+            if self._thread_waiters[thread_id] == 0:
+                del self._thread_waiters[thread_id]
+                del self._thread_locks[thread_id]
+            await run.finish()
+
+
+turn_registry = TurnRegistry(ttl=settings.IDEMPOTENCY_TTL, max_runs=settings.IDEMPOTENCY_MAX_RUNS)
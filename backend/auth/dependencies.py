@@ -1,27 +1,28 @@
 """
 Auth dependencies for FastAPI route protection
 """
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
+import hmac
 import uuid
 
 from auth.utils import decode_token
 from db.pool import db
+from db.dependencies import RequestConnection, get_request_conn
+from profiling.spans import span
 from agent.config import settings
 
 security = HTTPBearer()
 
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> dict:
+async def authenticate_token(token: str, request_conn: Optional[RequestConnection] = None) -> dict:
     """
-    Dependency to get the current authenticated user.
-    Use this to protect routes that require authentication.
+    Verify a bearer token and load its user.
+    Shared by the HTTP dependencies and the WebSocket handshake; HTTP requests
+    pass their request-scoped connection so the lookup doesn't take another one.
     """
-    token = credentials.credentials
     payload = decode_token(token)
     
     if not payload:
@@ -39,11 +40,14 @@ async def get_current_user(
         )
     
     # Fetch user from database
-    async with db.pool.acquire() as conn:
-        user = await conn.fetchrow(
-            f"SELECT user_id, email, name FROM {settings.SCHEMA}.users WHERE user_id = $1",
-            uuid.UUID(user_id)
-        )
+    query = f"SELECT user_id, email, name FROM {settings.SCHEMA}.users WHERE user_id = $1"
+    if request_conn is not None:
+        conn = await request_conn.acquire(user_id)
+        user = await conn.fetchrow(query, uuid.UUID(user_id))
+    else:
+        pool = await db.reader(user_id)
+        async with pool.acquire() as conn:
+            user = await conn.fetchrow(query, uuid.UUID(user_id))
     
     if not user:
         raise HTTPException(
@@ -58,8 +62,41 @@ async def get_current_user(
     }
 
 
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    request_conn: RequestConnection = Depends(get_request_conn)
+) -> dict:
+    """
+    Dependency to get the current authenticated user.
+    Use this to protect routes that require authentication.
+    """
+    with span("get_current_user"):
+        return await authenticate_token(credentials.credentials, request_conn)
+
+
+async def get_token_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
+    """
+    Lightweight auth dependency - verifies the JWT only, without a users lookup.
+    Use for high-volume write endpoints that must not take a pool connection per call.
+    """
+    payload = decode_token(credentials.credentials)
+    user_id = payload.get("sub") if payload else None
+
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return {"user_id": user_id}
+
+
 async def get_optional_user(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+    request_conn: RequestConnection = Depends(get_request_conn)
 ) -> Optional[dict]:
     """
     Optional user dependency - returns None if not authenticated.
@@ -69,7 +106,16 @@ async def get_optional_user(
         return None
     
     try:
-        return await get_current_user(credentials)
+        return await get_current_user(credentials, request_conn)
     except HTTPException:
         return None
 
+
+async def require_admin(x_admin_key: Optional[str] = Header(default=None)) -> None:
+    """
+    Dependency for admin-only routes, gated by the ADMIN_API_KEY shared secret.
+    """
+    if not settings.ADMIN_API_KEY or not x_admin_key or not hmac.compare_digest(
+        x_admin_key, settings.ADMIN_API_KEY
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
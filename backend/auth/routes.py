@@ -44,6 +44,7 @@ async def signup(request: SignupRequest):
             """,
             user_id, request.email, password_hash, request.name
         )
+        await db.mark_write(conn, user_id)
     
     # Generate token
     access_token = create_access_token(data={"sub": str(user_id)})
@@ -0,0 +1,140 @@
+"""
+Micro-benchmark: Python-side vs SQL-side JSON rendering of a message page.
+
+Seeds a temporary table shaped like chat_messages (nothing is written to the
+real schema) and compares, for pages of up to 200 rows:
+
+  python  fetch Records -> build dicts (str(uuid), isoformat) -> orjson.dumps
+  sql     json_agg/json_build_object in Postgres -> fetch one text value
+
+Uses the app's pg_* settings. Run:
+    python benchmarks/bench_list_rendering.py --rows 200 --iterations 500
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import asyncpg
+import orjson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.config import settings  # noqa: E402
+
+SEED_TABLE = """
+    CREATE TEMP TABLE bench_messages (
+        message_id UUID,
+        turn_id UUID,
+        thread_id UUID,
+        role TEXT,
+        message TEXT,
+        metadata JSONB,
+        is_deleted BOOLEAN,
+        created_at TIMESTAMPTZ
+    )
+"""
+
+SEED_ROWS = """
+    INSERT INTO bench_messages
+    SELECT
+        gen_random_uuid(),
+        gen_random_uuid(),
+        '00000000-0000-0000-0000-000000000001'::uuid,
+        CASE WHEN i % 2 = 0 THEN 'user' ELSE 'assistant' END,
+        repeat('lorem ipsum dolor sit amet ', 20 + (i % 40)),
+        '{"model": "gpt-5.1", "prompt_tokens": 812, "completion_tokens": 240}'::jsonb,
+        false,
+        NOW() - make_interval(secs => $1::int - i)
+    FROM generate_series(1, $1::int) AS i
+"""
+
+ROWS_QUERY = """
+    SELECT message_id, turn_id, role, message, metadata::text AS metadata, created_at
+    FROM bench_messages
+    WHERE thread_id = $1 AND is_deleted = false
+    ORDER BY created_at ASC
+    OFFSET $2 LIMIT $3
+"""
+
+JSON_QUERY = f"""
+    WITH page AS ({ROWS_QUERY})
+    SELECT json_build_object(
+        'thread_id', $1::uuid,
+        'messages', COALESCE(json_agg(json_build_object(
+            'message_id', page.message_id,
+            'turn_id', page.turn_id,
+            'role', page.role,
+            'content', page.message,
+            'metadata', page.metadata,
+            'created_at', page.created_at
+        ) ORDER BY page.created_at), '[]'::json),
+        'pagination', json_build_object('offset', $2::bigint, 'limit', $3::bigint)
+    )::text
+    FROM page
+"""
+
+THREAD_ID = "00000000-0000-0000-0000-000000000001"
+
+
+async def python_path(conn, limit: int) -> bytes:
+    rows = await conn.fetch(ROWS_QUERY, THREAD_ID, 0, limit)
+    return orjson.dumps({
+        "thread_id": THREAD_ID,
+        "messages": [
+            {
+                "message_id": str(row["message_id"]),
+                "turn_id": str(row["turn_id"]),
+                "role": row["role"],
+                "content": row["message"],
+                "metadata": row["metadata"],
+                "created_at": row["created_at"].isoformat()
+            }
+            for row in rows
+        ],
+        "pagination": {"offset": 0, "limit": limit}
+    })
+
+
+async def sql_path(conn, limit: int) -> bytes:
+    return (await conn.fetchval(JSON_QUERY, THREAD_ID, 0, limit)).encode("utf-8")
+
+
+async def measure(name: str, fn, conn, limit: int, iterations: int):
+    await fn(conn, limit)  # warm up (plan cache, statement prep)
+    start = time.perf_counter()
+    size = 0
+    for _ in range(iterations):
+        size = len(await fn(conn, limit))
+    elapsed = time.perf_counter() - start
+    rows_per_sec = limit * iterations / elapsed
+    print(f"{name:>6}: {elapsed / iterations * 1000:8.3f} ms/page  {rows_per_sec:12,.0f} rows/sec  {size:,} bytes/page")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200, help="rows per page")
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(
+        user=settings.pg_user,
+        password=settings.pg_password,
+        database=settings.pg_dbname,
+        host=settings.pg_host,
+        port=settings.pg_port,
+    )
+    try:
+        await conn.execute(SEED_TABLE)
+        await conn.execute(SEED_ROWS, args.rows)
+        await conn.execute("CREATE INDEX ON bench_messages(thread_id, created_at)")
+        await conn.execute("ANALYZE bench_messages")
+        print(f"page size: {args.rows} rows, {args.iterations} iterations")
+        await measure("python", python_path, conn, args.rows, args.iterations)
+        await measure("sql", sql_path, conn, args.rows, args.iterations)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
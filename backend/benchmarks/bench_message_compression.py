@@ -0,0 +1,144 @@
+"""
+Micro-benchmark: storage size and read cost of compressed chat messages.
+
+Builds a synthetic corpus of assistant answers (markdown with prose, lists,
+code and tables, 1-16 KB) and compares, for messages at or above
+MESSAGE_COMPRESS_MIN_BYTES:
+
+  raw        UTF-8 bytes as stored in `message`
+  zstd       compress_message() at the configured level
+  zstd+dict  same, with a dictionary trained on a separate part of the corpus
+
+and the read-path overhead: decompressing one message, and
+render_messages_body() on a page that needs expanding vs one that passes
+through. The synthetic answers share a lot of text, so ratios (especially
+with a dictionary) are an upper bound; run scripts/train_message_dictionary.py
+against real data for representative numbers.
+
+No database needed. Run:
+    python benchmarks/bench_message_compression.py --messages 2000 --iterations 200
+"""
+import argparse
+import base64
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import orjson
+import zstandard
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.config import settings  # noqa: E402
+from persistance.compression import compress_message, decompress_message  # noqa: E402
+from persistance.history import render_messages_body  # noqa: E402
+
+WORDS = (
+    "request latency index query cache connection pool async handler database "
+    "thread message stream token model response batch retry timeout profile "
+    "memory user page offset limit schema column migration replica"
+).split()
+
+CODE = """```python
+async def {name}(conn, {arg}):
+    rows = await conn.fetch("SELECT * FROM {table} WHERE {arg} = $1", {arg})
+    return [dict(row) for row in rows]
+```
+"""
+
+TABLE = """| option | latency | notes |
+|--------|---------|-------|
+| {a}    | {x} ms  | simple |
+| {b}    | {y} ms  | needs an index on ({a}, created_at) |
+"""
+
+
+def synthetic_answer(rng: random.Random) -> str:
+    target = rng.randint(1024, 16 * 1024)
+    parts = []
+    while sum(len(p) for p in parts) < target:
+        kind = rng.random()
+        if kind < 0.5:
+            parts.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 80))).capitalize() + ".\n")
+        elif kind < 0.7:
+            parts.append("".join(f"{i}. **{rng.choice(WORDS)}** - {' '.join(rng.sample(WORDS, 8))}\n" for i in range(1, 5)))
+        elif kind < 0.85:
+            parts.append(CODE.format(name=rng.choice(WORDS), arg=rng.choice(WORDS), table=rng.choice(WORDS)))
+        else:
+            parts.append(TABLE.format(a=rng.choice(WORDS), b=rng.choice(WORDS), x=rng.randint(1, 99), y=rng.randint(1, 99)))
+        if rng.random() < 0.2:
+            parts.append(f"\n## {rng.choice(WORDS).title()}\n\n")
+    return "".join(parts)
+
+
+def per_op_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def page_row(messages: list, compress: bool) -> dict:
+    """A row as thread_messages_json_query returns it"""
+    now = datetime.now(timezone.utc).isoformat()
+    entries, has_compressed = [], False
+    for i, text in enumerate(messages):
+        entry = {
+            "message_id": str(uuid.uuid4()),
+            "turn_id": str(uuid.uuid4()),
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": text,
+            "metadata": {"model": "gpt-5.1"},
+            "created_at": now,
+        }
+        stored, compressed, codec = compress_message(text) if compress and i % 2 else (text, None, None)
+        if compressed is not None:
+            entry.update(content=stored, content_z=base64.b64encode(compressed).decode(), codec=codec)
+            has_compressed = True
+        entries.append(entry)
+    body = {"thread_id": str(uuid.uuid4()), "messages": entries, "pagination": {"offset": 0, "limit": len(entries)}}
+    return {"body": orjson.dumps(body).decode(), "has_compressed": has_compressed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    corpus = [synthetic_answer(rng) for _ in range(args.messages)]
+    training, corpus = corpus[: args.messages // 4], corpus[args.messages // 4:]
+    large = [text.encode("utf-8") for text in corpus if len(text.encode("utf-8")) >= settings.MESSAGE_COMPRESS_MIN_BYTES]
+
+    level = settings.MESSAGE_ZSTD_LEVEL
+    dictionary = zstandard.train_dictionary(64 * 1024, [t.encode("utf-8") for t in training], level=level)
+    plain = zstandard.ZstdCompressor(level=level)
+    with_dict = zstandard.ZstdCompressor(level=level, dict_data=dictionary)
+
+    raw_bytes = sum(len(m) for m in large)
+    zstd_bytes = sum(len(plain.compress(m)) for m in large)
+    dict_bytes = sum(len(with_dict.compress(m)) for m in large)
+    print(f"{len(large):,} messages >= {settings.MESSAGE_COMPRESS_MIN_BYTES} bytes (level {level})")
+    print(f"{'raw':>10}  {raw_bytes:>12,} bytes")
+    print(f"{'zstd':>10}  {zstd_bytes:>12,} bytes  {raw_bytes / zstd_bytes:.2f}x")
+    print(f"{'zstd+dict':>10}  {dict_bytes:>12,} bytes  {raw_bytes / dict_bytes:.2f}x")
+
+    sample = large[len(large) // 2]
+    frame = plain.compress(sample)
+    print(f"\nper message ({len(sample):,} bytes)")
+    print(f"  compress    {per_op_us(lambda: compress_message(sample.decode('utf-8')), args.iterations):8.1f} us")
+    print(f"  decompress  {per_op_us(lambda: decompress_message(frame, 'zstd'), args.iterations):8.1f} us")
+
+    page = corpus[: args.page_size]
+    expanded, passthrough = page_row(page, compress=True), page_row(page, compress=False)
+    print(f"\nper page ({args.page_size} messages)")
+    print(f"  passthrough {per_op_us(lambda: render_messages_body(passthrough), args.iterations):8.1f} us")
+    print(f"  expand      {per_op_us(lambda: render_messages_body(expanded), args.iterations):8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
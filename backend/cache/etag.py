@@ -0,0 +1,37 @@
+"""
+Strong ETag helpers for conditional GETs.
+
+ETags are derived from cheap version stamps (e.g. MAX(updated_at) + COUNT(*))
+so an unchanged list can be answered with 304 before the heavy query runs.
+"""
+import hashlib
+
+from fastapi import Request, Response
+
+# Clients must revalidate every time, but may keep the body
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from version stamp parts"""
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True when the request's If-None-Match already carries this ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in [tag.strip() for tag in header.split(",")]
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
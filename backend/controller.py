@@ -1,54 +1,62 @@
-from fastapi import APIRouter, HTTPException, Query, Depends, Request
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
 from fastapi.responses import StreamingResponse
-from typing import Optional
+from typing import Optional, Union
 
-from schema import ChatRequest, RenameThreadRequest
-from agent.builder import agent_service
-from auth.dependencies import get_current_user, get_optional_user
+from schema import ChatRequest, RenameThreadRequest, FeedbackRequest
+from agent.turns import IdempotencyKeyReused, request_fingerprint, turn_registry
+from auth.dependencies import get_current_user, get_optional_user, get_token_user, require_admin
 from db.pool import db
+from db.dependencies import RequestConnection, get_request_conn
 from agent.config import settings
+from cache.etag import make_etag, etag_matches, not_modified, set_etag
+from persistance.snapshots import create_snapshot, load_snapshot
+from persistance.feedback_buffer import feedback_buffer
+from persistance.history import THREADS_PAGE_JSON, render_messages_body, thread_messages_json_query
+from profiling.spans import span
+from profiling.store import profile_store
 
 import uuid
 import json
+import gzip
 
 router = APIRouter()
 import time
 
 
-async def check_anonymous_rate_limit(ip_address: str) -> dict:
+async def check_anonymous_rate_limit(conn, ip_address: str) -> dict:
     """
     Check and increment anonymous user rate limit.
     Returns dict with 'allowed', 'remaining', and 'limit' keys.
+    Runs on the request's connection (shared with auth).
     """
-    async with db.pool.acquire() as conn:
-        # Try to get existing record for today
-        row = await conn.fetchrow(f"""
-            SELECT request_count FROM {settings.SCHEMA}.anonymous_usage
-            WHERE ip_address = $1 AND usage_date = CURRENT_DATE
-        """, ip_address)
-        
-        if row is None:
-            # First request today - create record
-            await conn.execute(f"""
-                INSERT INTO {settings.SCHEMA}.anonymous_usage (ip_address, usage_date, request_count)
-                VALUES ($1, CURRENT_DATE, 1)
-            """, ip_address)
-            return {"allowed": True, "remaining": settings.ANONYMOUS_DAILY_LIMIT - 1, "limit": settings.ANONYMOUS_DAILY_LIMIT}
-        
-        current_count = row["request_count"]
-        
-        if current_count >= settings.ANONYMOUS_DAILY_LIMIT:
-            # Limit exceeded
-            return {"allowed": False, "remaining": 0, "limit": settings.ANONYMOUS_DAILY_LIMIT}
-        
-        # Increment counter
+    # Try to get existing record for today
+    row = await conn.fetchrow(f"""
+        SELECT request_count FROM {settings.SCHEMA}.anonymous_usage
+        WHERE ip_address = $1 AND usage_date = CURRENT_DATE
+    """, ip_address)
+    
+    if row is None:
+        # First request today - create record
         await conn.execute(f"""
-            UPDATE {settings.SCHEMA}.anonymous_usage
-            SET request_count = request_count + 1, updated_at = NOW()
-            WHERE ip_address = $1 AND usage_date = CURRENT_DATE
+            INSERT INTO {settings.SCHEMA}.anonymous_usage (ip_address, usage_date, request_count)
+            VALUES ($1, CURRENT_DATE, 1)
         """, ip_address)
-        
-        return {"allowed": True, "remaining": settings.ANONYMOUS_DAILY_LIMIT - current_count - 1, "limit": settings.ANONYMOUS_DAILY_LIMIT}
+        return {"allowed": True, "remaining": settings.ANONYMOUS_DAILY_LIMIT - 1, "limit": settings.ANONYMOUS_DAILY_LIMIT}
+    
+    current_count = row["request_count"]
+    
+    if current_count >= settings.ANONYMOUS_DAILY_LIMIT:
+        # Limit exceeded
+        return {"allowed": False, "remaining": 0, "limit": settings.ANONYMOUS_DAILY_LIMIT}
+    
+    # Increment counter
+    await conn.execute(f"""
+        UPDATE {settings.SCHEMA}.anonymous_usage
+        SET request_count = request_count + 1, updated_at = NOW()
+        WHERE ip_address = $1 AND usage_date = CURRENT_DATE
+    """, ip_address)
+    
+    return {"allowed": True, "remaining": settings.ANONYMOUS_DAILY_LIMIT - current_count - 1, "limit": settings.ANONYMOUS_DAILY_LIMIT}
 
 
 def get_client_ip(request: Request) -> str:
@@ -67,65 +75,55 @@ def get_client_ip(request: Request) -> str:
     return request.client.host if request.client else "unknown"
 
 
+def _raw_json(body: Union[str, bytes], etag: str) -> Response:
+    """Send a JSON body rendered by Postgres as-is"""
+    content = body.encode("utf-8") if isinstance(body, str) else body
+    response = Response(content=content, media_type="application/json")
+    set_etag(response, etag)
+    return response
+
+
 @router.get("/conversations")
 async def get_conversations(
+    request: Request,
     current_user: dict = Depends(get_current_user),
+    db_conn: RequestConnection = Depends(get_request_conn),
     offset: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(28, ge=1, le=100, description="Max records to return")
 ):
     """
     Fetch conversation threads for a user with pagination.
     Returns threads sorted by most recently updated.
+    Supports If-None-Match: unchanged lists return 304 without fetching rows.
     """
     user_id = current_user["user_id"]
     try:
-        async with db.pool.acquire() as conn:
-            # Get threads with pagination
-            start_time = time.time()
-            rows = await conn.fetch(f"""
-                SELECT 
-                    thread_id,
-                    user_id,
-                    thread_title,
-                    created_at,
-                    updated_at
-                FROM {settings.SCHEMA}.conversation_threads
-                WHERE user_id = $1 AND is_deleted = false
-                ORDER BY updated_at DESC
-                OFFSET $2
-                LIMIT $3
-            """, uuid.UUID(user_id), offset, limit)
-            end_time = time.time()
-            print(f"Time taken to fetch threads: {end_time - start_time} seconds")
-            # Get total count for pagination metadata
-            start_time = time.time()
-            total = await conn.fetchval(f"""
-                SELECT COUNT(*) 
-                FROM {settings.SCHEMA}.conversation_threads
-                WHERE user_id = $1 AND is_deleted = false
-            """, uuid.UUID(user_id))
-            end_time = time.time()
-            print(f"Time taken to fetch total count: {end_time - start_time} seconds")
-            threads = [
-                {
-                    "thread_id": str(row["thread_id"]),
-                    "user_id": str(row["user_id"]),
-                    "title": row["thread_title"],
-                    "created_at": row["created_at"].isoformat(),
-                    "updated_at": row["updated_at"].isoformat()
-                }
-                for row in rows
-            ]
-            
-            return {
-                "threads": threads,
-                "pagination": {
-                    "offset": offset,
-                    "limit": limit,
-                    "total": total,
-                    "has_more": offset + len(threads) < total
-                }
-            }
+        conn = await db_conn.acquire(user_id)
+        # Version stamp for this user's thread list. Deletes and renames bump
+        # updated_at, so the stamp covers deleted rows too; also gives the total.
+        stamp = await conn.fetchrow(f"""
+            SELECT
+                COUNT(*) FILTER (WHERE is_deleted = false) AS total,
+                COUNT(*) AS version_count,
+                MAX(updated_at) AS version_ts
+            FROM {settings.SCHEMA}.conversation_threads
+            WHERE user_id = $1
+        """, uuid.UUID(user_id))
+        total = stamp["total"]
+        etag = make_etag(
+            "threads", user_id, stamp["version_count"], stamp["version_ts"], offset, limit
+        )
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        # Postgres renders the whole response body; returned without re-serializing
+        start_time = time.time()
+        body = await conn.fetchval(
+            THREADS_PAGE_JSON, uuid.UUID(user_id), offset, limit, total
+        )
+        end_time = time.time()
+        print(f"Time taken to fetch threads: {end_time - start_time} seconds")
+        return _raw_json(body, etag)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user_id format")
     except Exception as e:
@@ -135,65 +133,45 @@ async def get_conversations(
 @router.get("/conversations/{thread_id}/messages")
 async def get_thread_messages(
     thread_id: str,
+    request: Request,
     current_user: dict = Depends(get_current_user),
+    db_conn: RequestConnection = Depends(get_request_conn),
     offset: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200)
 ):
     """
     Fetch messages for a specific conversation thread.
+    Supports If-None-Match keyed on the thread's updated_at.
     """
     user_id = current_user["user_id"]
     try:
-        async with db.pool.acquire() as conn:
-            # Verify thread belongs to user
-            start_time = time.time()
-            thread = await conn.fetchrow(f"""
-                SELECT thread_id FROM {settings.SCHEMA}.conversation_threads
-                WHERE thread_id = $1 AND user_id = $2 AND is_deleted = false
-            """, uuid.UUID(thread_id), uuid.UUID(user_id))
-            end_time = time.time()
-            print(f"Time taken to fetch thread: {end_time - start_time} seconds")
-            if not thread:
-                raise HTTPException(status_code=404, detail="Thread not found")
-            
-            # Get messages
-            start_time = time.time()
-            rows = await conn.fetch(f"""
-                SELECT 
-                    message_id,
-                    turn_id,
-                    role,
-                    message,
-                    metadata,
-                    created_at
-                FROM {settings.SCHEMA}.chat_messages
-                WHERE thread_id = $1 AND is_deleted = false
-                ORDER BY created_at ASC
-                OFFSET $2
-                LIMIT $3
-            """, uuid.UUID(thread_id), offset, limit)
-            end_time = time.time()
-            print(f"Time taken to fetch messages: {end_time - start_time} seconds")
-            messages = [
-                {
-                    "message_id": str(row["message_id"]),
-                    "turn_id": str(row["turn_id"]),
-                    "role": row["role"],
-                    "content": row["message"],
-                    "metadata": row["metadata"],
-                    "created_at": row["created_at"].isoformat()
-                }
-                for row in rows
-            ]
-            
-            return {
-                "thread_id": thread_id,
-                "messages": messages,
-                "pagination": {
-                    "offset": offset,
-                    "limit": limit
-                }
-            }
+        conn = await db_conn.acquire(user_id)
+        # Verify thread belongs to user
+        start_time = time.time()
+        thread = await conn.fetchrow(f"""
+            SELECT thread_id, updated_at, archived_at FROM {settings.SCHEMA}.conversation_threads
+            WHERE thread_id = $1 AND user_id = $2 AND is_deleted = false
+        """, uuid.UUID(thread_id), uuid.UUID(user_id))
+        end_time = time.time()
+        print(f"Time taken to fetch thread: {end_time - start_time} seconds")
+        if not thread:
+            raise HTTPException(status_code=404, detail="Thread not found")
+
+        # New messages always bump the thread's updated_at in the same transaction
+        etag = make_etag("messages", thread_id, thread["updated_at"], offset, limit)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        
+        # Get messages (archived threads also read from the archive tier),
+        # rendered to JSON by Postgres; compressed messages are expanded here
+        start_time = time.time()
+        row = await conn.fetchrow(
+            thread_messages_json_query(thread["archived_at"] is not None),
+            uuid.UUID(thread_id), offset, limit
+        )
+        end_time = time.time()
+        print(f"Time taken to fetch messages: {end_time - start_time} seconds")
+        return _raw_json(render_messages_body(row), etag)
     except HTTPException:
         raise
     except ValueError:
@@ -206,30 +184,32 @@ async def get_thread_messages(
 async def rename_thread(
     thread_id: str,
     request: RenameThreadRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db_conn: RequestConnection = Depends(get_request_conn)
 ):
     """
     Rename a conversation thread.
     """
     user_id = current_user["user_id"]
     try:
-        async with db.pool.acquire() as conn:
-            # Update thread title, ensuring it belongs to user and isn't deleted
-            result = await conn.execute(f"""
-                UPDATE {settings.SCHEMA}.conversation_threads
-                SET thread_title = $1, updated_at = NOW()
-                WHERE thread_id = $2 AND user_id = $3 AND is_deleted = false
-            """, request.title, uuid.UUID(thread_id), uuid.UUID(user_id))
-            
-            # Check if any row was updated
-            if result == "UPDATE 0":
-                raise HTTPException(status_code=404, detail="Thread not found")
-            
-            return {
-                "thread_id": thread_id,
-                "title": request.title,
-                "message": "Thread renamed successfully"
-            }
+        conn = await db_conn.acquire(user_id)
+        # Update thread title, ensuring it belongs to user and isn't deleted
+        result = await conn.execute(f"""
+            UPDATE {settings.SCHEMA}.conversation_threads
+            SET thread_title = $1, updated_at = NOW()
+            WHERE thread_id = $2 AND user_id = $3 AND is_deleted = false
+        """, request.title, uuid.UUID(thread_id), uuid.UUID(user_id))
+        
+        # Check if any row was updated
+        if result == "UPDATE 0":
+            raise HTTPException(status_code=404, detail="Thread not found")
+        await db.mark_write(conn, user_id)
+        
+        return {
+            "thread_id": thread_id,
+            "title": request.title,
+            "message": "Thread renamed successfully"
+        }
     except HTTPException:
         raise
     except ValueError:
@@ -241,29 +221,59 @@ async def rename_thread(
 @router.delete("/conversations/{thread_id}")
 async def delete_thread(
     thread_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db_conn: RequestConnection = Depends(get_request_conn)
 ):
     """
     Soft delete a conversation thread.
     """
     user_id = current_user["user_id"]
     try:
-        async with db.pool.acquire() as conn:
-            # Soft delete the thread
-            result = await conn.execute(f"""
-                UPDATE {settings.SCHEMA}.conversation_threads
-                SET is_deleted = true, updated_at = NOW()
-                WHERE thread_id = $1 AND user_id = $2 AND is_deleted = false
-            """, uuid.UUID(thread_id), uuid.UUID(user_id))
-            
-            # Check if any row was updated
-            if result == "UPDATE 0":
-                raise HTTPException(status_code=404, detail="Thread not found")
-            
-            return {
-                "thread_id": thread_id,
-                "message": "Thread deleted successfully"
-            }
+        conn = await db_conn.acquire(user_id)
+        # Soft delete the thread
+        result = await conn.execute(f"""
+            UPDATE {settings.SCHEMA}.conversation_threads
+            SET is_deleted = true, updated_at = NOW()
+            WHERE thread_id = $1 AND user_id = $2 AND is_deleted = false
+        """, uuid.UUID(thread_id), uuid.UUID(user_id))
+        
+        # Check if any row was updated
+        if result == "UPDATE 0":
+            raise HTTPException(status_code=404, detail="Thread not found")
+        await db.mark_write(conn, user_id)
+        
+        return {
+            "thread_id": thread_id,
+            "message": "Thread deleted successfully"
+        }
+    except HTTPException:
+        raise
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/conversations/{thread_id}/share")
+async def share_thread(
+    thread_id: str,
+    current_user: dict = Depends(get_current_user),
+    db_conn: RequestConnection = Depends(get_request_conn)
+):
+    """
+    Snapshot a conversation thread and return a short share id.
+    Sharing unchanged content again returns the same id.
+    """
+    user_id = current_user["user_id"]
+    try:
+        snapshot = await create_snapshot(await db_conn.acquire(user_id), thread_id, user_id)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail="Thread not found")
+        return {
+            "thread_id": thread_id,
+            "share_id": snapshot["share_id"],
+            "created": snapshot["created"]
+        }
     except HTTPException:
         raise
     except ValueError:
@@ -272,24 +282,259 @@ async def delete_thread(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/share/{share_id}")
+async def get_shared_snapshot(share_id: str, request: Request):
+    """
+    Public read of a share snapshot.
+    Snapshots are immutable, so they are cached forever by browsers and CDNs.
+    """
+    # Existence first, so a guessed share_id with If-None-Match still gets a 404
+    payload = await load_snapshot(share_id)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Share not found")
+
+    etag = f'"{share_id}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Vary": "Accept-Encoding"
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    # Stored payload is already gzipped - hand it out as-is when the client accepts it
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=payload, media_type="application/json", headers=headers)
+    return Response(content=gzip.decompress(payload), media_type="application/json", headers=headers)
+
+
+@router.post("/feedback", status_code=202)
+async def submit_feedback(
+    request: FeedbackRequest,
+    current_user: dict = Depends(get_token_user)
+):
+    """
+    Record thumbs up/down feedback for an assistant message.
+    Acknowledged immediately; the event is buffered and flushed in batches.
+    A user's latest vote per message replaces earlier ones, and events for
+    messages that aren't the user's own are dropped at flush time.
+    """
+    try:
+        accepted = feedback_buffer.add(
+            message_id=uuid.UUID(request.message_id),
+            user_id=uuid.UUID(current_user["user_id"]),
+            rating=1 if request.rating == "up" else -1,
+            reasons=request.reasons,
+            comment=request.comment
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid message_id format")
+
+    if not accepted:
+        raise HTTPException(status_code=503, detail="Feedback buffer full, retry later")
+    return {"message_id": request.message_id, "accepted": True}
+
+
+@router.get("/messages/{message_id}/rating")
+async def get_message_rating(
+    message_id: str,
+    current_user: dict = Depends(get_current_user),
+    db_conn: RequestConnection = Depends(get_request_conn)
+):
+    """
+    Aggregate rating for a message (reads the incrementally maintained summary).
+    Only the owner of the message's thread can read it.
+    """
+    user_id = current_user["user_id"]
+    try:
+        message_uuid = uuid.UUID(message_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+
+    try:
+        conn = await db_conn.acquire(user_id)
+        row = await conn.fetchrow(f"""
+            SELECT mr.thumbs_up, mr.thumbs_down, mr.total, mr.score, mr.last_feedback_at
+            FROM {settings.SCHEMA}.chat_messages cm
+            JOIN {settings.SCHEMA}.conversation_threads th ON th.thread_id = cm.thread_id
+            LEFT JOIN {settings.SCHEMA}.message_ratings mr ON mr.message_id = cm.message_id
+            WHERE cm.message_id = $1
+              AND th.user_id = $2
+            LIMIT 1
+        """, message_uuid, uuid.UUID(user_id))
+
+        if not row:
+            raise HTTPException(status_code=404, detail="Message not found")
+        if row["total"] is None:
+            return {"message_id": message_id, "thumbs_up": 0, "thumbs_down": 0, "total": 0, "score": 0}
+        return {
+            "message_id": message_id,
+            "thumbs_up": row["thumbs_up"],
+            "thumbs_down": row["thumbs_down"],
+            "total": row["total"],
+            "score": row["score"],
+            "last_feedback_at": row["last_feedback_at"].isoformat()
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _usage_row(row) -> dict:
+    turns = row["turns"]
+    return {
+        "turns": turns,
+        "prompt_tokens": row["prompt_tokens"],
+        "completion_tokens": row["completion_tokens"],
+        "avg_ttft_ms": round(row["total_ttft_ms"] / turns, 2) if turns else None,
+        "avg_generation_ms": round(row["total_generation_ms"] / turns, 2) if turns else None,
+        "max_generation_ms": row["max_generation_ms"]
+    }
+
+
+@router.get("/usage")
+async def get_usage(
+    current_user: dict = Depends(get_current_user),
+    db_conn: RequestConnection = Depends(get_request_conn),
+    days: int = Query(30, ge=1, le=365)
+):
+    """
+    Token and latency usage for the current user, per day and model.
+    Served from the daily rollup table.
+    """
+    user_id = current_user["user_id"]
+    try:
+        conn = await db_conn.acquire(user_id)
+        rows = await conn.fetch(f"""
+            SELECT usage_date, model, turns, prompt_tokens, completion_tokens,
+                   total_ttft_ms, total_generation_ms, max_generation_ms
+            FROM {settings.SCHEMA}.usage_daily_user
+            WHERE user_id = $1 AND usage_date > CURRENT_DATE - $2::int
+            ORDER BY usage_date DESC, model
+        """, uuid.UUID(user_id), days)
+
+        return {
+            "days": days,
+            "usage": [
+                {"date": row["usage_date"].isoformat(), "model": row["model"], **_usage_row(row)}
+                for row in rows
+            ],
+            "totals": {
+                "turns": sum(row["turns"] for row in rows),
+                "prompt_tokens": sum(row["prompt_tokens"] for row in rows),
+                "completion_tokens": sum(row["completion_tokens"] for row in rows)
+            }
+        }
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid user_id format")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/admin/usage/models", dependencies=[Depends(require_admin)])
+async def get_model_usage(
+    days: int = Query(30, ge=1, le=365),
+    db_conn: RequestConnection = Depends(get_request_conn)
+):
+    """
+    Per-model daily usage across all users, for capacity planning.
+    """
+    try:
+        conn = await db_conn.acquire()
+        rows = await conn.fetch(f"""
+            SELECT usage_date, model, turns, active_users, prompt_tokens, completion_tokens,
+                   total_ttft_ms, total_generation_ms, max_generation_ms
+            FROM {settings.SCHEMA}.usage_daily_model
+            WHERE usage_date > CURRENT_DATE - $1::int
+            ORDER BY usage_date DESC, model
+        """, days)
+
+        return {
+            "days": days,
+            "usage": [
+                {
+                    "date": row["usage_date"].isoformat(),
+                    "model": row["model"],
+                    "active_users": row["active_users"],
+                    **_usage_row(row)
+                }
+                for row in rows
+            ]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles(limit: int = Query(50, ge=1, le=200)):
+    """
+    Recent request profiles (PROFILING_ENABLED), newest first.
+    """
+    return {"profiles": profile_store.list(limit)}
+
+
+@router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str):
+    """
+    Span breakdown for one profiled request.
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@router.get("/admin/profiles/{profile_id}/wall-clock", dependencies=[Depends(require_admin)])
+async def get_profile_wall_clock(profile_id: str):
+    """
+    pyinstrument wall-clock profile (HTML) for one profiled request, when captured.
+    """
+    html = profile_store.get_wall_clock(profile_id)
+    if html is None:
+        raise HTTPException(status_code=404, detail="Wall-clock profile not found")
+    return Response(content=html, media_type="text/html")
+
+
 @router.post("/chat/stream")
 async def chat_stream(
     request: Request,
     chat_request: ChatRequest,
-    current_user: Optional[dict] = Depends(get_optional_user)
+    current_user: Optional[dict] = Depends(get_optional_user),
+    db_conn: RequestConnection = Depends(get_request_conn)
 ):
     """
     Streaming chat endpoint - sends chunks as Server-Sent Events (SSE).
     Works for both authenticated and anonymous users.
     Anonymous users are limited to 5 questions per day.
+
+    An Idempotency-Key header makes retries safe: a duplicate of an in-flight
+    request attaches to the running stream, a duplicate of a finished one gets
+    the stored result; reusing a key for a different request is a 422.
+    Turns on the same thread are serialized.
     """
     is_anonymous = current_user is None
     rate_limit_info = None
+    user_id = current_user["user_id"] if current_user else None
+
+    idempotency_key = request.headers.get("Idempotency-Key")
+    run_key = None
+    if idempotency_key:
+        owner = user_id or f"anon:{get_client_ip(request)}"
+        run_key = f"{owner}:{idempotency_key}"
+    fingerprint = request_fingerprint(chat_request.threadId, chat_request.message)
+    try:
+        run = turn_registry.get(run_key, fingerprint)
+    except IdempotencyKeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    replayed = run is not None
+
     start_time = time.time()
-    # Check rate limit for anonymous users
-    if is_anonymous:
+    # Check rate limit for anonymous users (retries of a known request are free)
+    if is_anonymous and not replayed:
         client_ip = get_client_ip(request)
-        rate_limit_info = await check_anonymous_rate_limit(client_ip)
+        with span("check_anonymous_rate_limit"):
+            rate_limit_info = await check_anonymous_rate_limit(await db_conn.acquire(), client_ip)
         
         if not rate_limit_info["allowed"]:
             raise HTTPException(
@@ -302,27 +547,38 @@ async def chat_stream(
             )
     end_time = time.time()
     print(f"Time taken to check rate limit: {end_time - start_time} seconds")
-    async def generate():
+
+    if run is None:
+        # start() re-checks the key, so a duplicate that raced us through the rate limit still attaches
         try:
-            user_id = current_user["user_id"] if current_user else None
-            
-            async for chunk in agent_service({
+            run = turn_registry.start(run_key, {
                 "user_id": user_id,
                 "thread_id": chat_request.threadId or str(uuid.uuid4()),
                 "parent_id": str(uuid.uuid4()),
                 "user_message": chat_request.message,
                 "persist": not is_anonymous  # Don't persist for anonymous users
-            }):
-                # Include rate limit info in first chunk for anonymous users
-                if is_anonymous and rate_limit_info and chunk.get("type") == "token":
-                    chunk["remaining_questions"] = rate_limit_info["remaining"]
-                
-                data = json.dumps(chunk)
-                yield f"data: {data}\n\n"
-                
-        except Exception as e:
-            error_data = json.dumps({"error": str(e)})
-            yield f"data: {error_data}\n\n"
+            }, fingerprint)
+        except IdempotencyKeyReused:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+
+    # Auth and rate limiting are done; don't hold the connection for the whole stream
+    await db_conn.release()
+
+    async def generate():
+        with span("generate"):
+            try:
+                async for chunk in run.subscribe():
+                    # Include rate limit info in first chunk for anonymous users
+                    if is_anonymous and rate_limit_info and chunk.get("type") == "token":
+                        chunk = {**chunk, "remaining_questions": rate_limit_info["remaining"]}
+
+                    with span("sse.encode"):
+                        data = f"data: {json.dumps(chunk)}\n\n"
+                    yield data
+
+            except Exception as e:
+                error_data = json.dumps({"error": str(e)})
+                yield f"data: {error_data}\n\n"
     
     return StreamingResponse(
         generate(),
@@ -330,6 +586,7 @@ async def chat_stream(
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"  # Disable buffering for nginx
+            "X-Accel-Buffering": "no",  # Disable buffering for nginx
+            "Idempotent-Replayed": "true" if replayed else "false"
         }
     )
@@ -1,5 +1,44 @@
+from typing import Optional
+
+import asyncpg
+from fastapi import Request
+
 from db.pool import db
 
 async def get_db_conn():
     async with db.pool.acquire() as connection:
         yield connection
+
+
+class RequestConnection:
+    """
+    One pool connection per request, acquired on first use and shared by auth,
+    rate limiting and the handler (FastAPI caches the dependency per request).
+    Read-only requests take it from db.reader(), so replica routing and
+    read-your-writes still apply.
+    """
+
+    def __init__(self, read_only: bool):
+        self.read_only = read_only
+        self._pool: Optional[asyncpg.Pool] = None
+        self._conn: Optional[asyncpg.Connection] = None
+
+    async def acquire(self, user_id=None) -> asyncpg.Connection:
+        if self._conn is None:
+            self._pool = await db.reader(user_id) if self.read_only else db.pool
+            self._conn = await self._pool.acquire()
+        return self._conn
+
+    async def release(self):
+        """Return the connection early (e.g. before streaming); safe to call more than once"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await self._pool.release(conn)
+
+
+async def get_request_conn(request: Request):
+    connection = RequestConnection(read_only=request.method in ("GET", "HEAD"))
+    try:
+        yield connection
+    finally:
+        await connection.release()
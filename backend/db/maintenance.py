@@ -0,0 +1,62 @@
+"""
+Periodic database maintenance: future partitions and the archive tier.
+"""
+import asyncio
+from typing import Optional
+
+from db.pool import db
+from agent.config import settings
+
+# Arbitrary app-wide key so only one worker runs maintenance at a time
+_ADVISORY_LOCK_KEY = 7_260_034
+
+_task: Optional[asyncio.Task] = None
+
+
+async def run_maintenance():
+    """Create upcoming monthly partitions and archive stale threads (one worker at a time)"""
+    async with db.pool.acquire() as conn:
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", _ADVISORY_LOCK_KEY):
+            return
+        try:
+            await conn.execute(
+                f"SELECT {settings.SCHEMA}.ensure_monthly_partitions($1)",
+                settings.PARTITION_MONTHS_AHEAD
+            )
+            archived = 1
+            # Archive in batches so each transaction stays short
+            while archived:
+                archived = await conn.fetchval(
+                    f"SELECT {settings.SCHEMA}.archive_stale_threads(make_interval(days => $1), $2)",
+                    settings.ARCHIVE_AFTER_DAYS, settings.ARCHIVE_BATCH_SIZE
+                )
+                if archived:
+                    print(f"[maintenance] Archived {archived} stale threads")
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", _ADVISORY_LOCK_KEY)
+
+
+async def _maintenance_loop():
+    while True:
+        try:
+            await run_maintenance()
+        except Exception as e:
+            print(f"[maintenance] Error: {e}")
+        await asyncio.sleep(settings.MAINTENANCE_INTERVAL)
+
+
+def start_maintenance():
+    global _task
+    if settings.MAINTENANCE_INTERVAL > 0 and _task is None:
+        _task = asyncio.create_task(_maintenance_loop())
+
+
+async def stop_maintenance():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -1,10 +1,88 @@
+import time
 import asyncpg
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from agent.config import settings
 
 
+def _lsn_to_int(lsn: str) -> int:
+    """Convert a pg_lsn text value ('16/B374D848') to a comparable integer"""
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
 class Database:
     pool: Optional[asyncpg.Pool] = None
+    # Optional read replica pool - GET endpoints read from here when configured
+    read_pool: Optional[asyncpg.Pool] = None
+
+    def __init__(self):
+        # user_id -> (deadline, primary LSN of the user's last write)
+        self._recent_writes: Dict[str, Tuple[float, Optional[int]]] = {}
+        self._replay_lsn: Optional[int] = None
+        self._replay_checked_at = 0.0
+
+    def note_write(self, user_id, lsn: Optional[str] = None):
+        """
+        Record that a user just wrote to the primary.
+        Their reads stay on the primary for a short window, or until the replica
+        has replayed past the write's LSN. Tracked per process.
+        """
+        if self.read_pool is None or user_id is None:
+            return
+        if len(self._recent_writes) > 10000:
+            now = time.monotonic()
+            self._recent_writes = {
+                k: v for k, v in self._recent_writes.items() if v[0] > now
+            }
+        self._recent_writes[str(user_id)] = (
+            time.monotonic() + settings.READ_YOUR_WRITES_WINDOW,
+            _lsn_to_int(lsn) if lsn else None,
+        )
+
+    async def mark_write(self, conn: asyncpg.Connection, user_id):
+        """note_write() with the primary's current WAL position, read on the writing connection"""
+        if self.read_pool is None or user_id is None:
+            return
+        lsn = await conn.fetchval("SELECT pg_current_wal_lsn()::text")
+        self.note_write(user_id, lsn)
+
+    async def _replica_replay_lsn(self) -> Optional[int]:
+        """Replica replay position, cached briefly so reads don't each pay a round trip"""
+        now = time.monotonic()
+        if now - self._replay_checked_at > settings.REPLICA_LSN_CACHE_SECONDS:
+            async with self.read_pool.acquire() as conn:
+                lsn = await conn.fetchval("SELECT pg_last_wal_replay_lsn()::text")
+            self._replay_lsn = _lsn_to_int(lsn) if lsn else None
+            self._replay_checked_at = now
+        return self._replay_lsn
+
+    async def reader(self, user_id=None) -> asyncpg.Pool:
+        """Pick the pool for a read: replica unless the user wrote recently (read-your-writes)"""
+        if self.read_pool is None:
+            return self.pool
+        if user_id is None:
+            return self.read_pool
+
+        entry = self._recent_writes.get(str(user_id))
+        if entry is None:
+            return self.read_pool
+
+        deadline, write_lsn = entry
+        if time.monotonic() >= deadline:
+            self._recent_writes.pop(str(user_id), None)
+            return self.read_pool
+
+        if write_lsn is not None:
+            try:
+                replay_lsn = await self._replica_replay_lsn()
+            except Exception as e:
+                print(f"[db.reader] Replica LSN check failed: {e}")
+                return self.pool
+            if replay_lsn is not None and replay_lsn >= write_lsn:
+                self._recent_writes.pop(str(user_id), None)
+                return self.read_pool
+
+        return self.pool
 
 db = Database()
 
@@ -20,8 +98,17 @@ async def init_db():
         max_size=20,
         command_timeout=60*2,
     )
+    if settings.pg_read_dsn:
+        db.read_pool = await asyncpg.create_pool(
+            dsn=settings.pg_read_dsn,
+            min_size=settings.READ_POOL_MIN_SIZE,
+            max_size=settings.READ_POOL_MAX_SIZE,
+            command_timeout=60*2,
+        )
 
 
 async def close_db():
+    if db.read_pool:
+        await db.read_pool.close()
     if db.pool:
         await db.pool.close()
@@ -1,11 +1,23 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from controller import router
+from middleware import GZipExceptStreamsMiddleware, ProfilingMiddleware
+from agent.config import settings
 from auth.routes import router as auth_router
+from ws_controller import router as ws_router
 
 from db.pool import init_db, close_db
+from db.maintenance import start_maintenance, stop_maintenance
+from agent.llm import close_llm_client, get_llm_client_stats
+from agent.router import tier_stats
+from agent.hedge import hedge_stats
+from agent.memory import memory_store
+from persistance.feedback_buffer import feedback_buffer
 
-app = FastAPI()
+# orjson for every endpoint that returns Python objects; the list endpoints
+# skip serialization entirely and return JSON rendered by Postgres
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Configure CORS for frontend
 app.add_middleware(
@@ -16,19 +28,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON responses (SSE endpoints are passed through untouched)
+app.add_middleware(GZipExceptStreamsMiddleware, minimum_size=1024)
+
+# Opt-in request profiling; when disabled the middleware isn't in the stack at all
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        secret=settings.PROFILE_SECRET,
+        sample_rate=settings.PROFILE_SAMPLE_RATE
+    )
+
 app.include_router(auth_router)
 app.include_router(router)
+app.include_router(ws_router)
 
 @app.on_event("startup")
 async def startup():
     await init_db()
+    feedback_buffer.start()
+    start_maintenance()
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    await stop_maintenance()
+    await feedback_buffer.stop()
     await close_db()
+    await close_llm_client()
 
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/health/llm")
+async def llm_health():
+    return {
+        "http_client": get_llm_client_stats(),
+        "tiers": tier_stats.snapshot(),
+        "hedging": hedge_stats.snapshot()
+    }
+
+
+@app.get("/health/memory")
+async def memory_health():
+    return memory_store.stats()
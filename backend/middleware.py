@@ -0,0 +1,109 @@
+"""
+Custom ASGI middleware
+"""
+import asyncio
+import hmac
+import random
+import time
+
+from fastapi.middleware.gzip import GZipMiddleware
+
+from profiling.spans import Profile, activate, deactivate
+from profiling.store import profile_store
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # optional: without it profiles carry spans only
+    Profiler = None
+
+
+class GZipExceptStreamsMiddleware(GZipMiddleware):
+    """
+    GZip large responses, but never touch streaming endpoints.
+    Compressing SSE would buffer tokens inside the compressor and break streaming.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, compresslevel: int = 6,
+                 excluded_paths: tuple = ("/chat/stream",)):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.excluded_paths = excluded_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.excluded_paths):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+class ProfilingMiddleware:
+    """
+    Profile sampled requests, and requests whose X-Profile-Key header matches
+    the profiling secret. Records the span breakdown (and a pyinstrument
+    wall-clock profile when installed) to the local profile store and returns
+    the id in X-Profile-Id. Only installed when PROFILING_ENABLED is set.
+    """
+
+    def __init__(self, app, secret: str = "", sample_rate: float = 0.0,
+                 excluded_paths: tuple = ("/health", "/admin/profiles")):
+        self.app = app
+        self.secret = secret.encode("utf-8")
+        self.sample_rate = sample_rate
+        self.excluded_paths = excluded_paths
+        self._wall_clock_busy = False
+
+    def _trigger(self, scope):
+        if self.secret:
+            for name, value in scope["headers"]:
+                if name == b"x-profile-key":
+                    return "header" if hmac.compare_digest(value, self.secret) else None
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def _start_wall_clock(self):
+        # pyinstrument samples the whole thread, so only one request at a time gets one
+        if Profiler is None or self._wall_clock_busy:
+            return None
+        self._wall_clock_busy = True
+        profiler = Profiler(interval=0.001, async_mode="disabled")
+        profiler.start()
+        return profiler
+
+    def _stop_wall_clock(self, profiler):
+        if profiler is None:
+            return None
+        profiler.stop()
+        self._wall_clock_busy = False
+        return profiler.output_html()
+
+    async def __call__(self, scope, receive, send):
+        trigger = None
+        if scope["type"] == "http" and not scope["path"].startswith(self.excluded_paths):
+            trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope["method"], scope["path"], trigger)
+        token = activate(profile)
+        profiler = self._start_wall_clock()
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"x-profile-id", profile.profile_id.encode("ascii"))]
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            end = time.perf_counter()
+            deactivate(token)
+            profile.wall_clock_html = self._stop_wall_clock(profiler)
+            try:
+                await asyncio.to_thread(profile_store.save, profile.to_dict(end), profile.wall_clock_html)
+            except Exception as e:
+                print(f"[ProfilingMiddleware] Could not save profile: {e}")
@@ -0,0 +1,8 @@
+-- Migration: Index backing the /conversations ETag version stamp
+-- Run this in your PostgreSQL database
+
+-- Covers the per-user version stamp (COUNT + MAX(updated_at)) and the
+-- ORDER BY updated_at DESC listing with an index-only scan
+CREATE INDEX IF NOT EXISTS idx_conversation_threads_user_updated
+    ON orion.conversation_threads(user_id, updated_at DESC)
+    INCLUDE (is_deleted);
@@ -0,0 +1,21 @@
+-- Migration: Add server-side share snapshots
+-- Run this in your PostgreSQL database
+
+-- Immutable, content-addressed snapshots of a conversation.
+-- share_id is derived from content_hash, so sharing the same content twice
+-- resolves to the same row.
+CREATE TABLE IF NOT EXISTS orion.shared_snapshots (
+    share_id VARCHAR(32) PRIMARY KEY,
+    content_hash BYTEA NOT NULL,
+    thread_id UUID NOT NULL,
+    user_id UUID NOT NULL,
+    payload BYTEA NOT NULL,          -- gzip-compressed JSON body
+    payload_size INTEGER NOT NULL,   -- uncompressed size in bytes
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+
+    CONSTRAINT unique_snapshot_hash UNIQUE (content_hash)
+);
+
+-- Lookup of a user's shares for a thread
+CREATE INDEX IF NOT EXISTS idx_shared_snapshots_thread
+    ON orion.shared_snapshots(thread_id);
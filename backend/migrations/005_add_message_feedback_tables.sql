@@ -0,0 +1,50 @@
+-- Migration: Add message feedback ingestion tables
+-- Run this in your PostgreSQL database
+
+-- Append-only feedback log, written in batches with COPY.
+-- No foreign key to chat_messages: ingestion must not pay for FK checks.
+CREATE TABLE IF NOT EXISTS orion.message_feedback (
+    feedback_id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    message_id UUID NOT NULL,
+    user_id UUID NOT NULL,
+    rating SMALLINT NOT NULL CHECK (rating IN (-1, 1)),  -- 1 = thumbs up, -1 = thumbs down
+    reasons TEXT[],
+    comment TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_message_feedback_message
+    ON orion.message_feedback(message_id);
+
+-- Time-ordered appends keep a BRIN index tiny
+CREATE INDEX IF NOT EXISTS idx_message_feedback_created_brin
+    ON orion.message_feedback USING BRIN (created_at);
+
+-- Each user's current vote per message; a new vote replaces the old one
+CREATE TABLE IF NOT EXISTS orion.message_feedback_latest (
+    message_id UUID NOT NULL,
+    user_id UUID NOT NULL,
+    rating SMALLINT NOT NULL CHECK (rating IN (-1, 1)),
+    updated_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (message_id, user_id)
+);
+
+-- Per-message counters, recomputed from message_feedback_latest for the
+-- messages touched by each flush
+CREATE TABLE IF NOT EXISTS orion.message_feedback_summary (
+    message_id UUID PRIMARY KEY,
+    thumbs_up INTEGER NOT NULL DEFAULT 0,
+    thumbs_down INTEGER NOT NULL DEFAULT 0,
+    last_feedback_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Cheap per-message rating view (single PK lookup, no scan of the log)
+CREATE OR REPLACE VIEW orion.message_ratings AS
+SELECT
+    message_id,
+    thumbs_up,
+    thumbs_down,
+    thumbs_up + thumbs_down AS total,
+    thumbs_up - thumbs_down AS score,
+    last_feedback_at
+FROM orion.message_feedback_summary;
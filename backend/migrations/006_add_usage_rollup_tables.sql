@@ -0,0 +1,35 @@
+-- Migration: Add daily usage rollups (tokens and latency)
+-- Run this in your PostgreSQL database
+
+-- Per user, per model, per day. Upserted in the same transaction that
+-- persists each turn, so reads never scan chat_messages.
+CREATE TABLE IF NOT EXISTS orion.usage_daily_user (
+    usage_date DATE NOT NULL,
+    user_id UUID NOT NULL,
+    model VARCHAR(100) NOT NULL,
+    turns INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    completion_tokens BIGINT NOT NULL DEFAULT 0,
+    total_ttft_ms BIGINT NOT NULL DEFAULT 0,
+    total_generation_ms BIGINT NOT NULL DEFAULT 0,
+    max_generation_ms INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+
+    PRIMARY KEY (user_id, usage_date, model)
+);
+
+-- Per model, per day - capacity planning across all users
+CREATE TABLE IF NOT EXISTS orion.usage_daily_model (
+    usage_date DATE NOT NULL,
+    model VARCHAR(100) NOT NULL,
+    turns INTEGER NOT NULL DEFAULT 0,
+    active_users INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    completion_tokens BIGINT NOT NULL DEFAULT 0,
+    total_ttft_ms BIGINT NOT NULL DEFAULT 0,
+    total_generation_ms BIGINT NOT NULL DEFAULT 0,
+    max_generation_ms INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+
+    PRIMARY KEY (usage_date, model)
+);
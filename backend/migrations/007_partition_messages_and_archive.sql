@@ -0,0 +1,270 @@
+-- Migration: Monthly range partitioning for chat_messages / conversation_turns,
+-- plus a compressed archive tier for stale threads
+-- Run this in your PostgreSQL database (PostgreSQL 14+ for lz4 TOAST compression).
+-- Copies all rows in one transaction - run it in a maintenance window.
+--
+-- Primary keys on partitioned tables must include the partition key, so they
+-- become (message_id, created_at) / (turn_id, created_at). Foreign keys that
+-- pointed at conversation_turns(turn_id) cannot be kept and are not recreated;
+-- all other foreign keys (e.g. thread_id -> conversation_threads) are.
+--
+-- Each table also gets a DEFAULT partition, so inserts never fail if
+-- maintenance is disabled (MAINTENANCE_INTERVAL=0) or falls behind; rows are
+-- moved out of it when their month's partition is created.
+
+BEGIN;
+
+-- ---------------------------------------------------------------------------
+-- Partition management
+-- ---------------------------------------------------------------------------
+
+-- Create the monthly partition of `parent` that contains `month` (no-op if it exists).
+-- Rows for that month already sitting in the DEFAULT partition are moved into it.
+CREATE OR REPLACE FUNCTION orion.create_monthly_partition(parent TEXT, month DATE)
+RETURNS VOID AS $$
+DECLARE
+    start_date DATE := date_trunc('month', month)::DATE;
+    end_date DATE := (date_trunc('month', month) + INTERVAL '1 month')::DATE;
+    partition_name TEXT := format('%s_p%s', parent, to_char(start_date, 'YYYY_MM'));
+BEGIN
+    IF to_regclass(format('orion.%I', partition_name)) IS NOT NULL THEN
+        RETURN;
+    END IF;
+
+    -- The new partition can't be created while the default holds rows in its range
+    EXECUTE format('CREATE TEMP TABLE _partition_moved (LIKE orion.%I)', parent);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM orion.%I WHERE created_at >= %L AND created_at < %L RETURNING *)
+         INSERT INTO _partition_moved SELECT * FROM moved',
+        parent || '_default', start_date, end_date
+    );
+
+    EXECUTE format(
+        'CREATE TABLE orion.%I PARTITION OF orion.%I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, parent, start_date, end_date
+    );
+
+    EXECUTE format('INSERT INTO orion.%I SELECT * FROM _partition_moved', parent);
+    DROP TABLE _partition_moved;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Make sure partitions exist from the current month through `months_ahead` months out.
+-- Called periodically by the app's maintenance task (or pg_cron).
+CREATE OR REPLACE FUNCTION orion.ensure_monthly_partitions(months_ahead INTEGER DEFAULT 3)
+RETURNS VOID AS $$
+DECLARE
+    i INTEGER;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        PERFORM orion.create_monthly_partition('chat_messages', (CURRENT_DATE + make_interval(months => i))::DATE);
+        PERFORM orion.create_monthly_partition('conversation_turns', (CURRENT_DATE + make_interval(months => i))::DATE);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ---------------------------------------------------------------------------
+-- chat_messages
+-- ---------------------------------------------------------------------------
+
+ALTER TABLE orion.chat_messages RENAME TO chat_messages_unpartitioned;
+
+CREATE TABLE orion.chat_messages (
+    LIKE orion.chat_messages_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+) PARTITION BY RANGE (created_at);
+
+ALTER TABLE orion.chat_messages ALTER COLUMN created_at SET NOT NULL;
+ALTER TABLE orion.chat_messages ADD PRIMARY KEY (message_id, created_at);
+
+CREATE TABLE orion.chat_messages_default PARTITION OF orion.chat_messages DEFAULT;
+
+-- History reads: WHERE thread_id = $1 AND is_deleted = false ORDER BY created_at
+CREATE INDEX IF NOT EXISTS idx_chat_messages_thread_created
+    ON orion.chat_messages(thread_id, created_at)
+    WHERE is_deleted = false;
+
+-- ---------------------------------------------------------------------------
+-- conversation_turns
+-- ---------------------------------------------------------------------------
+
+ALTER TABLE orion.conversation_turns RENAME TO conversation_turns_unpartitioned;
+
+CREATE TABLE orion.conversation_turns (
+    LIKE orion.conversation_turns_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+) PARTITION BY RANGE (created_at);
+
+ALTER TABLE orion.conversation_turns ALTER COLUMN created_at SET NOT NULL;
+ALTER TABLE orion.conversation_turns ADD PRIMARY KEY (turn_id, created_at);
+
+CREATE TABLE orion.conversation_turns_default PARTITION OF orion.conversation_turns DEFAULT;
+
+CREATE INDEX IF NOT EXISTS idx_conversation_turns_turn
+    ON orion.conversation_turns(turn_id);
+CREATE INDEX IF NOT EXISTS idx_conversation_turns_thread
+    ON orion.conversation_turns(thread_id);
+
+-- Foreign keys are not copied by LIKE; recreate all but the ones pointing at
+-- conversation_turns(turn_id), which is no longer unique on its own
+DO $$
+DECLARE
+    fk RECORD;
+BEGIN
+    FOR fk IN
+        SELECT c.conname, c.conrelid::regclass AS old_table, pg_get_constraintdef(c.oid) AS def
+        FROM pg_constraint c
+        WHERE c.contype = 'f'
+          AND c.conrelid IN ('orion.chat_messages_unpartitioned'::regclass,
+                             'orion.conversation_turns_unpartitioned'::regclass)
+          AND c.confrelid <> 'orion.conversation_turns_unpartitioned'::regclass
+    LOOP
+        EXECUTE format(
+            'ALTER TABLE orion.%I ADD CONSTRAINT %I %s',
+            CASE WHEN fk.old_table = 'orion.chat_messages_unpartitioned'::regclass
+                 THEN 'chat_messages' ELSE 'conversation_turns' END,
+            fk.conname, fk.def
+        );
+    END LOOP;
+END $$;
+
+-- ---------------------------------------------------------------------------
+-- Backfill: partitions for every month that has data, then copy rows over
+-- ---------------------------------------------------------------------------
+
+-- created_at is the partition key and can't be NULL any more; date such rows
+-- from their turn, then their thread (the old tables are updated in place)
+UPDATE orion.conversation_turns_unpartitioned t
+SET created_at = COALESCE(
+    (SELECT th.created_at FROM orion.conversation_threads th WHERE th.thread_id = t.thread_id),
+    NOW()
+)
+WHERE t.created_at IS NULL;
+
+UPDATE orion.chat_messages_unpartitioned m
+SET created_at = COALESCE(
+    (SELECT t.created_at FROM orion.conversation_turns_unpartitioned t WHERE t.turn_id = m.turn_id LIMIT 1),
+    (SELECT th.created_at FROM orion.conversation_threads th WHERE th.thread_id = m.thread_id),
+    NOW()
+)
+WHERE m.created_at IS NULL;
+
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    FOR month IN
+        SELECT DISTINCT date_trunc('month', created_at)::DATE FROM orion.chat_messages_unpartitioned
+    LOOP
+        PERFORM orion.create_monthly_partition('chat_messages', month);
+    END LOOP;
+
+    FOR month IN
+        SELECT DISTINCT date_trunc('month', created_at)::DATE FROM orion.conversation_turns_unpartitioned
+    LOOP
+        PERFORM orion.create_monthly_partition('conversation_turns', month);
+    END LOOP;
+END $$;
+
+SELECT orion.ensure_monthly_partitions(3);
+
+INSERT INTO orion.chat_messages
+SELECT * FROM orion.chat_messages_unpartitioned;
+
+INSERT INTO orion.conversation_turns
+SELECT * FROM orion.conversation_turns_unpartitioned;
+
+-- Old tables are kept for rollback; drop them once the migration is verified:
+--   DROP TABLE orion.chat_messages_unpartitioned;
+--   DROP TABLE orion.conversation_turns_unpartitioned;
+
+-- ---------------------------------------------------------------------------
+-- Archive tier
+-- ---------------------------------------------------------------------------
+
+-- One row per archived thread; messages/turns are ordered JSON arrays.
+-- Soft-deleted messages are archived too, with their is_deleted flag.
+-- lz4 TOAST compression keeps the cold tier small.
+CREATE TABLE IF NOT EXISTS orion.archived_threads (
+    thread_id UUID PRIMARY KEY,
+    messages JSONB NOT NULL,
+    turns JSONB NOT NULL,
+    message_count INTEGER NOT NULL,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE orion.archived_threads ALTER COLUMN messages SET COMPRESSION lz4;
+ALTER TABLE orion.archived_threads ALTER COLUMN turns SET COMPRESSION lz4;
+
+-- Set when a thread's older history lives in archived_threads
+ALTER TABLE orion.conversation_threads ADD COLUMN IF NOT EXISTS archived_at TIMESTAMPTZ;
+
+-- Move up to `batch_limit` threads untouched for `stale_after` into the archive.
+-- Returns the number of threads archived.
+CREATE OR REPLACE FUNCTION orion.archive_stale_threads(
+    stale_after INTERVAL DEFAULT INTERVAL '90 days',
+    batch_limit INTEGER DEFAULT 500
+)
+RETURNS INTEGER AS $$
+DECLARE
+    archived_count INTEGER;
+BEGIN
+    CREATE TEMP TABLE IF NOT EXISTS _archive_batch (thread_id UUID PRIMARY KEY) ON COMMIT DROP;
+    TRUNCATE _archive_batch;
+
+    INSERT INTO _archive_batch
+    SELECT thread_id FROM orion.conversation_threads
+    WHERE updated_at < NOW() - stale_after
+      -- Never archived, or picked up again (new turns) since the last archive
+      AND (archived_at IS NULL OR archived_at < updated_at)
+    ORDER BY updated_at
+    LIMIT batch_limit
+    FOR UPDATE SKIP LOCKED;
+
+    GET DIAGNOSTICS archived_count = ROW_COUNT;
+    IF archived_count = 0 THEN
+        RETURN 0;
+    END IF;
+
+    INSERT INTO orion.archived_threads (thread_id, messages, turns, message_count)
+    SELECT
+        b.thread_id,
+        COALESCE(m.messages, '[]'::jsonb),
+        COALESCE(t.turns, '[]'::jsonb),
+        COALESCE(m.message_count, 0)
+    FROM _archive_batch b
+    LEFT JOIN LATERAL (
+        SELECT
+            jsonb_agg(jsonb_build_object(
+                'message_id', cm.message_id,
+                'turn_id', cm.turn_id,
+                'role', cm.role,
+                'message', cm.message,
+                'metadata', cm.metadata::jsonb,
+                'is_deleted', cm.is_deleted,
+                'created_at', cm.created_at
+            ) ORDER BY cm.created_at) AS messages,
+            COUNT(*) FILTER (WHERE cm.is_deleted = false) AS message_count
+        FROM orion.chat_messages cm
+        WHERE cm.thread_id = b.thread_id
+    ) m ON true
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(to_jsonb(ct) ORDER BY ct.created_at) AS turns
+        FROM orion.conversation_turns ct
+        WHERE ct.thread_id = b.thread_id
+    ) t ON true
+    ON CONFLICT (thread_id) DO UPDATE SET
+        messages = orion.archived_threads.messages || EXCLUDED.messages,
+        turns = orion.archived_threads.turns || EXCLUDED.turns,
+        message_count = orion.archived_threads.message_count + EXCLUDED.message_count,
+        archived_at = NOW();
+
+    DELETE FROM orion.chat_messages cm USING _archive_batch b WHERE cm.thread_id = b.thread_id;
+    DELETE FROM orion.conversation_turns ct USING _archive_batch b WHERE ct.thread_id = b.thread_id;
+
+    UPDATE orion.conversation_threads ct SET archived_at = NOW()
+    FROM _archive_batch b WHERE ct.thread_id = b.thread_id;
+
+    RETURN archived_count;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
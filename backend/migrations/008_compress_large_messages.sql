@@ -0,0 +1,94 @@
+-- Migration: zstd-compressed storage for large chat messages
+-- Run this in your PostgreSQL database.
+--
+-- Schema only - compression happens in the app (Postgres has no zstd for
+-- bytea). New large assistant messages are written compressed right away;
+-- existing rows are converted online, in small keyset batches, by
+--     python scripts/backfill_message_compression.py
+-- which can run while the app is serving traffic.
+--
+-- A row holds either `message` (plain text) or `message_compressed` +
+-- `message_codec`, never both.
+
+BEGIN;
+
+ALTER TABLE orion.chat_messages ADD COLUMN IF NOT EXISTS message_compressed BYTEA;
+ALTER TABLE orion.chat_messages ADD COLUMN IF NOT EXISTS message_codec TEXT;
+ALTER TABLE orion.chat_messages ALTER COLUMN message DROP NOT NULL;
+
+-- Already compressed: store out of line without another (pglz/lz4) pass
+ALTER TABLE orion.chat_messages ALTER COLUMN message_compressed SET STORAGE EXTERNAL;
+
+-- Archive tier: compressed messages are carried over as base64 ('message_z')
+-- and decoded by the app on read. Same as 007 otherwise.
+CREATE OR REPLACE FUNCTION orion.archive_stale_threads(
+    stale_after INTERVAL DEFAULT INTERVAL '90 days',
+    batch_limit INTEGER DEFAULT 500
+)
+RETURNS INTEGER AS $$
+DECLARE
+    archived_count INTEGER;
+BEGIN
+    CREATE TEMP TABLE IF NOT EXISTS _archive_batch (thread_id UUID PRIMARY KEY) ON COMMIT DROP;
+    TRUNCATE _archive_batch;
+
+    INSERT INTO _archive_batch
+    SELECT thread_id FROM orion.conversation_threads
+    WHERE updated_at < NOW() - stale_after
+      -- Never archived, or picked up again (new turns) since the last archive
+      AND (archived_at IS NULL OR archived_at < updated_at)
+    ORDER BY updated_at
+    LIMIT batch_limit
+    FOR UPDATE SKIP LOCKED;
+
+    GET DIAGNOSTICS archived_count = ROW_COUNT;
+    IF archived_count = 0 THEN
+        RETURN 0;
+    END IF;
+
+    INSERT INTO orion.archived_threads (thread_id, messages, turns, message_count)
+    SELECT
+        b.thread_id,
+        COALESCE(m.messages, '[]'::jsonb),
+        COALESCE(t.turns, '[]'::jsonb),
+        COALESCE(m.message_count, 0)
+    FROM _archive_batch b
+    LEFT JOIN LATERAL (
+        SELECT
+            jsonb_agg(jsonb_build_object(
+                'message_id', cm.message_id,
+                'turn_id', cm.turn_id,
+                'role', cm.role,
+                'message', cm.message,
+                'message_z', encode(cm.message_compressed, 'base64'),
+                'message_codec', cm.message_codec,
+                'metadata', cm.metadata::jsonb,
+                'is_deleted', cm.is_deleted,
+                'created_at', cm.created_at
+            ) ORDER BY cm.created_at) AS messages,
+            COUNT(*) FILTER (WHERE cm.is_deleted = false) AS message_count
+        FROM orion.chat_messages cm
+        WHERE cm.thread_id = b.thread_id
+    ) m ON true
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(to_jsonb(ct) ORDER BY ct.created_at) AS turns
+        FROM orion.conversation_turns ct
+        WHERE ct.thread_id = b.thread_id
+    ) t ON true
+    ON CONFLICT (thread_id) DO UPDATE SET
+        messages = orion.archived_threads.messages || EXCLUDED.messages,
+        turns = orion.archived_threads.turns || EXCLUDED.turns,
+        message_count = orion.archived_threads.message_count + EXCLUDED.message_count,
+        archived_at = NOW();
+
+    DELETE FROM orion.chat_messages cm USING _archive_batch b WHERE cm.thread_id = b.thread_id;
+    DELETE FROM orion.conversation_turns ct USING _archive_batch b WHERE ct.thread_id = b.thread_id;
+
+    UPDATE orion.conversation_threads ct SET archived_at = NOW()
+    FROM _archive_batch b WHERE ct.thread_id = b.thread_id;
+
+    RETURN archived_count;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
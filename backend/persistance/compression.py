@@ -0,0 +1,82 @@
+"""
+Compressed storage for large chat messages.
+
+Messages at or above MESSAGE_COMPRESS_MIN_BYTES are stored zstd-compressed in
+chat_messages.message_compressed (with message_codec = 'zstd') and `message`
+left NULL; short messages stay plain text. Reads decompress lazily - only
+rows that are actually compressed, only when they are returned.
+
+An optional shared dictionary (trained on our own answers with
+scripts/train_message_dictionary.py) improves the ratio on the typical
+few-KB markdown answer. Every *.zdict next to MESSAGE_ZSTD_DICT_PATH is
+loaded for reading, and each frame records its dictionary id, so rotating to
+a new dictionary never strands rows written with an older one.
+"""
+import base64
+import glob
+import os
+from typing import Dict, Optional, Tuple
+
+import zstandard
+
+from agent.config import settings
+
+ZSTD_CODEC = "zstd"
+
+
+def _load_dictionaries() -> Tuple[Optional[zstandard.ZstdCompressionDict], Dict[int, zstandard.ZstdCompressionDict]]:
+    """The active dictionary (for writes) and every known dictionary by id (for reads)"""
+    path = settings.MESSAGE_ZSTD_DICT_PATH
+    if not path:
+        return None, {}
+    known = {}
+    for candidate in glob.glob(os.path.join(os.path.dirname(path) or ".", "*.zdict")):
+        with open(candidate, "rb") as f:
+            dictionary = zstandard.ZstdCompressionDict(f.read())
+        known[dictionary.dict_id()] = dictionary
+    with open(path, "rb") as f:
+        active = zstandard.ZstdCompressionDict(f.read())
+    known[active.dict_id()] = active
+    return active, known
+
+
+_active_dict, _dictionaries = _load_dictionaries()
+
+
+def compress_message(text: str) -> Tuple[Optional[str], Optional[bytes], Optional[str]]:
+    """
+    Storage form of a message: (message, message_compressed, message_codec).
+    Falls back to plain text when the message is short or doesn't shrink enough.
+    """
+    raw = text.encode("utf-8")
+    if settings.MESSAGE_COMPRESSION != ZSTD_CODEC or len(raw) < settings.MESSAGE_COMPRESS_MIN_BYTES:
+        return text, None, None
+    # Compressor objects aren't thread safe; creating one is cheap next to compressing KBs
+    compressed = zstandard.ZstdCompressor(
+        level=settings.MESSAGE_ZSTD_LEVEL, dict_data=_active_dict
+    ).compress(raw)
+    if len(compressed) > len(raw) * 0.9:
+        return text, None, None
+    return None, compressed, ZSTD_CODEC
+
+
+def decompress_message(data: bytes, codec: str) -> str:
+    if codec != ZSTD_CODEC:
+        raise ValueError(f"Unknown message codec: {codec}")
+    dict_id = zstandard.get_frame_parameters(data).dict_id
+    dictionary = _dictionaries.get(dict_id) if dict_id else None
+    if dict_id and dictionary is None:
+        raise ValueError(f"Message was compressed with unknown dictionary {dict_id}")
+    return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(data).decode("utf-8")
+
+
+def message_text(row) -> str:
+    """Plain text of a chat message row (message / message_compressed / message_codec columns)"""
+    if row["message"] is not None or row["message_compressed"] is None:
+        return row["message"]
+    return decompress_message(bytes(row["message_compressed"]), row["message_codec"])
+
+
+def decompress_base64(data: str, codec: str) -> str:
+    """decompress_message for payloads Postgres rendered into JSON as base64"""
+    return decompress_message(base64.b64decode(data), codec)
@@ -0,0 +1,207 @@
+"""
+Buffered feedback ingestion.
+
+Feedback events are acknowledged immediately and kept in memory. A background
+task flushes them in one transaction per batch, either when the batch is full
+or when the flush interval elapses. One flush = one pool connection, no matter
+how many events it carries.
+
+A flush drops events for messages that don't exist or aren't the user's own
+assistant messages, COPYs the rest into the append-only log, keeps each user's
+latest vote per message, and recomputes the summary of the touched messages
+from those votes - voting again, or switching up/down, never double counts.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from db.pool import db
+from agent.config import settings
+
+_COLUMNS = ("message_id", "user_id", "rating", "reasons", "comment", "created_at")
+
+# (message_id, user_id) pairs where the message is one of the user's assistant messages.
+# Archived threads are not consulted, so feedback on archived messages is dropped.
+_OWNED_MESSAGES = f"""
+    SELECT i.message_id, i.user_id
+    FROM unnest($1::uuid[], $2::uuid[]) AS i(message_id, user_id)
+    WHERE EXISTS (
+        SELECT 1
+        FROM {settings.SCHEMA}.chat_messages cm
+        JOIN {settings.SCHEMA}.conversation_threads th ON th.thread_id = cm.thread_id
+        WHERE cm.message_id = i.message_id
+          AND cm.role = 'assistant'
+          AND th.user_id = i.user_id
+    )
+"""
+
+# Lock the touched summary rows (in a fixed order) so concurrent flushes from
+# other workers recompute one after the other, each seeing the other's votes
+_LOCK_SUMMARY = f"""
+    WITH created AS (
+        INSERT INTO {settings.SCHEMA}.message_feedback_summary (message_id)
+        SELECT DISTINCT unnest($1::uuid[]) ORDER BY 1
+        ON CONFLICT (message_id) DO NOTHING
+    )
+    SELECT message_id FROM {settings.SCHEMA}.message_feedback_summary
+    WHERE message_id = ANY($1::uuid[])
+    ORDER BY message_id
+    FOR UPDATE
+"""
+
+_UPSERT_LATEST = f"""
+    INSERT INTO {settings.SCHEMA}.message_feedback_latest (message_id, user_id, rating, updated_at)
+    SELECT * FROM unnest($1::uuid[], $2::uuid[], $3::smallint[], $4::timestamptz[])
+    ON CONFLICT (message_id, user_id) DO UPDATE SET
+        rating = EXCLUDED.rating,
+        updated_at = EXCLUDED.updated_at
+    WHERE message_feedback_latest.updated_at <= EXCLUDED.updated_at
+"""
+
+_RECOMPUTE_SUMMARY = f"""
+    UPDATE {settings.SCHEMA}.message_feedback_summary s SET
+        thumbs_up = v.thumbs_up,
+        thumbs_down = v.thumbs_down,
+        last_feedback_at = v.last_feedback_at
+    FROM (
+        SELECT
+            message_id,
+            COUNT(*) FILTER (WHERE rating > 0) AS thumbs_up,
+            COUNT(*) FILTER (WHERE rating < 0) AS thumbs_down,
+            MAX(updated_at) AS last_feedback_at
+        FROM {settings.SCHEMA}.message_feedback_latest
+        WHERE message_id = ANY($1::uuid[])
+        GROUP BY message_id
+    ) v
+    WHERE s.message_id = v.message_id
+"""
+
+
+class FeedbackBuffer:
+    """In-memory feedback buffer with size/time triggered batch flushes"""
+
+    def __init__(self, max_batch: int, flush_interval: float, max_pending: int):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: List[tuple] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.flushed = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def add(
+        self,
+        message_id: uuid.UUID,
+        user_id: uuid.UUID,
+        rating: int,
+        reasons: Optional[List[str]] = None,
+        comment: Optional[str] = None
+    ) -> bool:
+        """Queue one feedback event. Returns False if the buffer is full and the event was dropped."""
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._pending.append(
+            (message_id, user_id, rating, reasons or None, comment or None, datetime.now(timezone.utc))
+        )
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+        return True
+
+    async def flush(self):
+        """Write everything currently buffered in a single transaction"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                written = await self._write(batch)
+                self.flushed += written
+                self.rejected += len(batch) - written
+            except Exception as e:
+                # Put the batch back (bounded) so a transient DB error doesn't lose it
+                room = max(self.max_pending - len(self._pending), 0)
+                self.dropped += max(len(batch) - room, 0)
+                self._pending = batch[:room] + self._pending
+                print(f"[feedback_buffer] Flush error: {e}")
+
+    async def _write(self, batch: List[tuple]) -> int:
+        """Write a batch; returns how many events were valid and written"""
+        async with db.pool.acquire() as conn:
+            async with conn.transaction():
+                owned = await conn.fetch(
+                    _OWNED_MESSAGES,
+                    [event[0] for event in batch],
+                    [event[1] for event in batch]
+                )
+                owned = {(row["message_id"], row["user_id"]) for row in owned}
+                batch = [event for event in batch if (event[0], event[1]) in owned]
+                if not batch:
+                    return 0
+
+                await conn.copy_records_to_table(
+                    "message_feedback",
+                    schema_name=settings.SCHEMA,
+                    records=batch,
+                    columns=_COLUMNS,
+                )
+
+                # Only the last vote per (message, user) in the batch counts
+                latest = {}
+                for message_id, user_id, rating, _, _, created_at in batch:
+                    latest[(message_id, user_id)] = (rating, created_at)
+                message_ids = sorted({message_id for message_id, _ in latest})
+
+                await conn.fetch(_LOCK_SUMMARY, message_ids)
+                await conn.execute(
+                    _UPSERT_LATEST,
+                    [key[0] for key in latest],
+                    [key[1] for key in latest],
+                    [vote[0] for vote in latest.values()],
+                    [vote[1] for vote in latest.values()]
+                )
+                await conn.execute(_RECOMPUTE_SUMMARY, message_ids)
+                return len(batch)
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background flusher and drain what's left"""
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+
+feedback_buffer = FeedbackBuffer(
+    max_batch=settings.FEEDBACK_FLUSH_BATCH_SIZE,
+    flush_interval=settings.FEEDBACK_FLUSH_INTERVAL,
+    max_pending=settings.FEEDBACK_MAX_PENDING,
+)
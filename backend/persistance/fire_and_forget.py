@@ -6,6 +6,9 @@ from typing import Optional
 from db.pool import db
 from agent.config import settings
 from agent.utils import generate_thread_title
+from agent.events import user_events
+from agent.memory import memory_store
+from persistance.compression import compress_message
 
 
 
@@ -45,16 +48,18 @@ async def persist_thread_and_turn(
     """
     Fire-and-forget: Create/update thread AND create turn in a single transaction.
     This avoids the race condition where turn insert fails because thread doesn't exist yet.
+    The rows are written first so persist_turn_complete() finds them; a new
+    thread's title is generated afterwards, outside the transaction.
     """
     try:
-        thread_title = generate_thread_title(user_message)
         async with db.pool.acquire() as conn:
             async with conn.transaction():
-                # First: ensure thread exists (upsert)
-                await conn.execute(f"""
+                # First: ensure thread exists (upsert); xmax = 0 means it was just created
+                created = await conn.fetchval(f"""
                     INSERT INTO {settings.SCHEMA}.conversation_threads (thread_id, user_id, thread_title)
                     VALUES ($1, $2, $3)
                     ON CONFLICT (thread_id) DO UPDATE SET updated_at = now()
+                    RETURNING (xmax = 0)
                 """, thread_id, user_id, thread_title)
                 
                 # Second: create the turn (thread now guaranteed to exist)
@@ -62,6 +67,23 @@ async def persist_thread_and_turn(
                     INSERT INTO {settings.SCHEMA}.conversation_turns (turn_id, thread_id, user_message, status)
                     VALUES ($1, $2, $3, 'running')
                 """, turn_id, thread_id, user_message)
+            await db.mark_write(conn, user_id)
+
+        # Only new threads get a title (one LLM call per thread, not per turn)
+        if created and thread_title is None:
+            thread_title = await generate_thread_title(user_message)
+            async with db.pool.acquire() as conn:
+                await conn.execute(f"""
+                    UPDATE {settings.SCHEMA}.conversation_threads SET thread_title = $2 WHERE thread_id = $1
+                """, thread_id, thread_title)
+                await db.mark_write(conn, user_id)
+        if created:
+            # Push the new title to the user's open WebSocket connections
+            user_events.publish(user_id, {
+                "type": "thread_title",
+                "thread_id": str(thread_id),
+                "title": thread_title
+            })
     except Exception as e:
         print(f"[persist_thread_and_turn] Error: {e}")
 
@@ -87,11 +109,14 @@ async def persist_message(
     """Fire-and-forget: Save a chat message"""
     try:
         message_id = uuid.uuid4()
+        # Large assistant answers are stored compressed
+        stored = compress_message(message) if role == "assistant" else (message, None, None)
         async with db.pool.acquire() as conn:
             await conn.execute(f"""
-                INSERT INTO {settings.SCHEMA}.chat_messages (message_id, thread_id, turn_id, role, message, metadata)
-                VALUES ($1, $2, $3, $4, $5, $6)
-            """, message_id, thread_id, turn_id, role, message, json.dumps(metadata) if metadata else None)
+                INSERT INTO {settings.SCHEMA}.chat_messages
+                    (message_id, thread_id, turn_id, role, message, message_compressed, message_codec, metadata)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+            """, message_id, thread_id, turn_id, role, *stored, json.dumps(metadata) if metadata else None)
     except Exception as e:
         print(f"[persist_message] Error: {e}")
 
@@ -101,10 +126,14 @@ async def persist_turn_complete(
     turn_id: uuid.UUID,
     user_message: str,
     assistant_message: str,
-    metadata: Optional[dict] = None
+    metadata: Optional[dict] = None,
+    assistant_message_id: Optional[uuid.UUID] = None,
+    user_id: Optional[uuid.UUID] = None
 ):
     """Fire-and-forget: Batch persist user message, assistant message, and mark turn complete"""
     try:
+        # Compress outside the transaction; large answers are stored as zstd
+        message, message_compressed, message_codec = compress_message(assistant_message)
         async with db.pool.acquire() as conn:
             async with conn.transaction():
                 # Save user message
@@ -115,10 +144,11 @@ async def persist_turn_complete(
                 
                 # Save assistant message
                 await conn.execute(f"""
-                    INSERT INTO {settings.SCHEMA}.chat_messages (message_id, thread_id, turn_id, role, message, metadata)
-                    VALUES ($1, $2, $3, 'assistant', $4, $5)
-                """, uuid.uuid4(), thread_id, turn_id, assistant_message, 
-                    json.dumps(metadata) if metadata else None)
+                    INSERT INTO {settings.SCHEMA}.chat_messages
+                        (message_id, thread_id, turn_id, role, message, message_compressed, message_codec, metadata)
+                    VALUES ($1, $2, $3, 'assistant', $4, $5, $6, $7)
+                """, assistant_message_id or uuid.uuid4(), thread_id, turn_id, message,
+                    message_compressed, message_codec, json.dumps(metadata) if metadata else None)
                 
                 # Mark turn as completed
                 await conn.execute(f"""
@@ -129,10 +159,59 @@ async def persist_turn_complete(
                 await conn.execute(f"""
                     UPDATE {settings.SCHEMA}.conversation_threads SET updated_at = now() WHERE thread_id = $1
                 """, thread_id)
+
+                if metadata and user_id:
+                    await _record_usage(conn, user_id, metadata)
+            await db.mark_write(conn, user_id)
+        if settings.MEMORY_ENABLED and user_id:
+            # Incremental retrieval-memory update for this user's later turns
+            await asyncio.to_thread(memory_store.add_turns, user_id, thread_id, [(user_message, assistant_message)])
     except Exception as e:
         print(f"[persist_turn_complete] Error: {e}")
 
 
+async def _record_usage(conn, user_id, metadata: dict):
+    """Incrementally roll a turn's tokens and latency into the daily usage tables"""
+    model = metadata.get("model") or "unknown"
+    prompt_tokens = metadata.get("prompt_tokens") or 0
+    completion_tokens = metadata.get("completion_tokens") or 0
+    ttft_ms = int(metadata.get("ttft_ms") or 0)
+    generation_ms = int(metadata.get("generation_ms") or 0)
+
+    # xmax = 0 means the row was inserted, i.e. this user's first turn on this model today
+    first_turn_today = await conn.fetchval(f"""
+        INSERT INTO {settings.SCHEMA}.usage_daily_user AS u
+            (usage_date, user_id, model, turns, prompt_tokens, completion_tokens,
+             total_ttft_ms, total_generation_ms, max_generation_ms)
+        VALUES (CURRENT_DATE, $1, $2, 1, $3, $4, $5, $6, $6)
+        ON CONFLICT (user_id, usage_date, model) DO UPDATE SET
+            turns = u.turns + 1,
+            prompt_tokens = u.prompt_tokens + EXCLUDED.prompt_tokens,
+            completion_tokens = u.completion_tokens + EXCLUDED.completion_tokens,
+            total_ttft_ms = u.total_ttft_ms + EXCLUDED.total_ttft_ms,
+            total_generation_ms = u.total_generation_ms + EXCLUDED.total_generation_ms,
+            max_generation_ms = GREATEST(u.max_generation_ms, EXCLUDED.max_generation_ms),
+            updated_at = now()
+        RETURNING (xmax = 0)
+    """, user_id, model, prompt_tokens, completion_tokens, ttft_ms, generation_ms)
+
+    await conn.execute(f"""
+        INSERT INTO {settings.SCHEMA}.usage_daily_model AS m
+            (usage_date, model, turns, active_users, prompt_tokens, completion_tokens,
+             total_ttft_ms, total_generation_ms, max_generation_ms)
+        VALUES (CURRENT_DATE, $1, 1, $2, $3, $4, $5, $6, $6)
+        ON CONFLICT (usage_date, model) DO UPDATE SET
+            turns = m.turns + 1,
+            active_users = m.active_users + EXCLUDED.active_users,
+            prompt_tokens = m.prompt_tokens + EXCLUDED.prompt_tokens,
+            completion_tokens = m.completion_tokens + EXCLUDED.completion_tokens,
+            total_ttft_ms = m.total_ttft_ms + EXCLUDED.total_ttft_ms,
+            total_generation_ms = m.total_generation_ms + EXCLUDED.total_generation_ms,
+            max_generation_ms = GREATEST(m.max_generation_ms, EXCLUDED.max_generation_ms),
+            updated_at = now()
+    """, model, 1 if first_turn_today else 0, prompt_tokens, completion_tokens, ttft_ms, generation_ms)
+
+
 # Helper to fire tasks without awaiting
 def fire(coro):
     """Schedule a coroutine to run in the background (fire-and-forget)"""
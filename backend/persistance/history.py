@@ -0,0 +1,166 @@
+"""
+Thread history reads across the hot (partitioned) and archive tiers.
+
+Archived threads keep their older messages as an ordered JSON array in
+archived_threads; anything written after archiving lives in chat_messages.
+Archived messages are always older, so the two tiers are simply
+concatenated and paged together.
+
+Large messages may be stored compressed (persistance/compression.py); rows
+carry message_compressed/message_codec next to `message`.
+"""
+import uuid
+from typing import List, Optional, Union
+
+import asyncpg
+import orjson
+
+from agent.config import settings
+from persistance.compression import decompress_base64
+
+_HOT_MESSAGES = f"""
+    SELECT
+        message_id,
+        turn_id,
+        role,
+        message,
+        message_compressed,
+        message_codec,
+        metadata::text AS metadata,
+        created_at
+    FROM {settings.SCHEMA}.chat_messages
+    WHERE thread_id = $1 AND is_deleted = false
+"""
+
+_ARCHIVED_MESSAGES = f"""
+    SELECT
+        (m->>'message_id')::uuid AS message_id,
+        (m->>'turn_id')::uuid AS turn_id,
+        m->>'role' AS role,
+        m->>'message' AS message,
+        decode(m->>'message_z', 'base64') AS message_compressed,
+        m->>'message_codec' AS message_codec,
+        NULLIF(m->'metadata', 'null'::jsonb)::text AS metadata,
+        (m->>'created_at')::timestamptz AS created_at
+    FROM {settings.SCHEMA}.archived_threads a,
+         jsonb_array_elements(a.messages) AS m
+    WHERE a.thread_id = $1 AND COALESCE((m->>'is_deleted')::boolean, false) = false
+"""
+
+
+def thread_messages_query(archived: bool) -> str:
+    """
+    Message rows for $1 (thread_id), oldest first, paged by $2 (offset) / $3 (limit).
+    Only archived threads pay for the archive lookup.
+    """
+    source = f"{_ARCHIVED_MESSAGES} UNION ALL {_HOT_MESSAGES}" if archived else _HOT_MESSAGES
+    return f"""
+        SELECT message_id, turn_id, role, message, message_compressed, message_codec, metadata, created_at
+        FROM ({source}) AS history
+        ORDER BY created_at ASC
+        OFFSET $2
+        LIMIT $3
+    """
+
+
+async def fetch_thread_messages(
+    conn: asyncpg.Connection,
+    thread_id: str,
+    archived: bool,
+    offset: int = 0,
+    limit: Optional[int] = None
+) -> List[asyncpg.Record]:
+    """Fetch a page of a thread's messages from whichever tiers hold them"""
+    return await conn.fetch(thread_messages_query(archived), uuid.UUID(thread_id), offset, limit)
+
+
+# ---------------------------------------------------------------------------
+# SQL-side JSON rendering: Postgres builds the response body, the route
+# returns the text as-is (no Record -> dict -> JSON round trip in Python).
+# ---------------------------------------------------------------------------
+
+THREADS_PAGE_JSON = f"""
+    WITH page AS (
+        SELECT thread_id, user_id, thread_title, created_at, updated_at
+        FROM {settings.SCHEMA}.conversation_threads
+        WHERE user_id = $1 AND is_deleted = false
+        ORDER BY updated_at DESC
+        OFFSET $2
+        LIMIT $3
+    )
+    SELECT json_build_object(
+        'threads', COALESCE(
+            json_agg(json_build_object(
+                'thread_id', page.thread_id,
+                'user_id', page.user_id,
+                'title', page.thread_title,
+                'created_at', page.created_at,
+                'updated_at', page.updated_at
+            ) ORDER BY page.updated_at DESC),
+            '[]'::json
+        ),
+        'pagination', json_build_object(
+            'offset', $2::bigint,
+            'limit', $3::bigint,
+            'total', $4::bigint,
+            'has_more', $2::bigint + COUNT(page.thread_id) < $4::bigint
+        )
+    )::text
+    FROM page
+"""
+
+
+_MESSAGE_JSON_FIELDS = """
+    'message_id', page.message_id,
+    'turn_id', page.turn_id,
+    'role', page.role,
+    'content', page.message,
+    'metadata', page.metadata,
+    'created_at', page.created_at
+"""
+
+
+def thread_messages_json_query(archived: bool) -> str:
+    """
+    Response body for a page of messages: $1 thread_id, $2 offset, $3 limit.
+    Field names and shapes match the Python-rendered response.
+    Returns (body, has_compressed): compressed rows carry base64 `content_z`
+    and `codec` for render_messages_body() to expand.
+    """
+    return f"""
+        WITH page AS ({thread_messages_query(archived)})
+        SELECT
+            json_build_object(
+                'thread_id', $1::uuid,
+                'messages', COALESCE(
+                    json_agg(
+                        CASE WHEN page.message_compressed IS NULL
+                            THEN json_build_object({_MESSAGE_JSON_FIELDS})
+                            ELSE json_build_object({_MESSAGE_JSON_FIELDS},
+                                'content_z', encode(page.message_compressed, 'base64'),
+                                'codec', page.message_codec)
+                        END
+                        ORDER BY page.created_at
+                    ),
+                    '[]'::json
+                ),
+                'pagination', json_build_object('offset', $2::bigint, 'limit', $3::bigint)
+            )::text AS body,
+            COALESCE(bool_or(page.message_compressed IS NOT NULL), false) AS has_compressed
+        FROM page
+    """
+
+
+def render_messages_body(row: asyncpg.Record) -> Union[str, bytes]:
+    """
+    Final response body from thread_messages_json_query. Pages without
+    compressed messages pass through untouched; otherwise only the
+    compressed entries are decompressed.
+    """
+    if not row["has_compressed"]:
+        return row["body"]
+    body = orjson.loads(row["body"])
+    for message in body["messages"]:
+        if "content_z" in message:
+            message["content"] = decompress_base64(message.pop("content_z"), message.pop("codec"))
+    return orjson.dumps(body)
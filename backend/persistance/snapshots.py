@@ -0,0 +1,96 @@
+"""
+Share snapshots - immutable, content-addressed copies of a conversation.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import uuid
+from typing import Optional
+
+from db.pool import db
+from agent.config import settings
+from cache.lru import LRUCache
+from persistance.compression import message_text
+from persistance.history import fetch_thread_messages
+
+# Snapshots never change once written, so cached payloads never go stale
+snapshot_cache = LRUCache(
+    max_entries=settings.SHARE_CACHE_MAX_ENTRIES,
+    max_bytes=settings.SHARE_CACHE_MAX_BYTES,
+)
+
+
+def _share_id_for(content_hash: bytes) -> str:
+    """Short URL-safe id derived from the content hash (96 bits)"""
+    return base64.urlsafe_b64encode(content_hash[:12]).decode("ascii")
+
+
+async def create_snapshot(conn, thread_id: str, user_id: str) -> Optional[dict]:
+    """
+    Snapshot a thread into a compressed record and return its share id.
+    Returns None if the thread does not exist or does not belong to the user.
+    Identical content maps to the same share id, so repeats are deduplicated.
+    Runs on the caller's (primary) connection.
+    """
+    thread = await conn.fetchrow(f"""
+        SELECT thread_title, archived_at FROM {settings.SCHEMA}.conversation_threads
+        WHERE thread_id = $1 AND user_id = $2 AND is_deleted = false
+    """, uuid.UUID(thread_id), uuid.UUID(user_id))
+    if not thread:
+        return None
+
+    rows = await fetch_thread_messages(conn, thread_id, thread["archived_at"] is not None)
+
+    content = {
+        "thread_id": thread_id,
+        "title": thread["thread_title"],
+        "messages": [
+            {
+                "role": row["role"],
+                "content": message_text(row),
+                "created_at": row["created_at"].isoformat()
+            }
+            for row in rows
+        ]
+    }
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    content_hash = hashlib.sha256(canonical).digest()
+    share_id = _share_id_for(content_hash)
+
+    body = json.dumps({"share_id": share_id, **content}, ensure_ascii=False).encode("utf-8")
+    payload = gzip.compress(body, mtime=0)
+
+    inserted = await conn.fetchval(f"""
+        INSERT INTO {settings.SCHEMA}.shared_snapshots
+            (share_id, content_hash, thread_id, user_id, payload, payload_size)
+        VALUES ($1, $2, $3, $4, $5, $6)
+        ON CONFLICT (share_id) DO NOTHING
+        RETURNING true
+    """, share_id, content_hash, uuid.UUID(thread_id), uuid.UUID(user_id), payload, len(body))
+
+    if inserted:
+        snapshot_cache.set(share_id, payload)
+    return {"share_id": share_id, "created": bool(inserted)}
+
+
+async def load_snapshot(share_id: str) -> Optional[bytes]:
+    """Return the gzip-compressed snapshot body, served from the LRU when possible"""
+    payload = snapshot_cache.get(share_id)
+    if payload is not None:
+        return payload
+
+    query = f"""
+        SELECT payload FROM {settings.SCHEMA}.shared_snapshots WHERE share_id = $1
+    """
+    pool = await db.reader()
+    async with pool.acquire() as conn:
+        payload = await conn.fetchval(query, share_id)
+    # A snapshot created moments ago may not have replicated yet
+    if payload is None and pool is not db.pool:
+        async with db.pool.acquire() as conn:
+            payload = await conn.fetchval(query, share_id)
+
+    if payload is not None:
+        snapshot_cache.set(share_id, payload)
+    return payload
@@ -0,0 +1,117 @@
+"""
+Opt-in per-request profiling - span breakdown for a single request.
+
+A Profile is attached to the request's context by ProfilingMiddleware, only
+for requests that are sampled or carry the secret X-Profile-Key header, and
+only when PROFILING_ENABLED is set (otherwise the middleware isn't installed).
+Tasks started while handling the request (e.g. the turn run) inherit it.
+
+Instrumented code calls span()/current_profile(); with no active profile
+these are a context-variable lookup returning a shared no-op.
+"""
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import List, Optional
+
+_current: ContextVar[Optional["Profile"]] = ContextVar("current_profile", default=None)
+
+
+class _Span:
+    __slots__ = ("profile", "name", "start")
+
+    def __init__(self, profile: "Profile", name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Profile:
+    """Spans recorded for one request (times relative to the request start)"""
+
+    def __init__(self, method: str, path: str, trigger: str):
+        self.profile_id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.spans: List[tuple] = []
+        self.status: Optional[int] = None
+        self.wall_clock_html: Optional[str] = None
+
+    def span(self, name: str) -> _Span:
+        return _Span(self, name)
+
+    def record(self, name: str, start: float, end: float):
+        self.spans.append((name, start, end))
+
+    def to_dict(self, end: float) -> dict:
+        totals: dict = {}
+        for name, start, stop in self.spans:
+            entry = totals.setdefault(name, {"count": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += (stop - start) * 1000
+        return {
+            "profile_id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "total_ms": round((end - self.start) * 1000, 3),
+            "has_wall_clock": self.wall_clock_html is not None,
+            # Repeated spans (per-chunk SSE encoding) are summarized, not listed
+            "spans": [
+                {
+                    "name": name,
+                    "start_ms": round((start - self.start) * 1000, 3),
+                    "duration_ms": round((stop - start) * 1000, 3),
+                }
+                for name, start, stop in self.spans
+                if totals[name]["count"] == 1
+            ],
+            "totals": {
+                name: {"count": entry["count"], "total_ms": round(entry["total_ms"], 3)}
+                for name, entry in totals.items()
+            },
+        }
+
+
+def current_profile() -> Optional[Profile]:
+    return _current.get()
+
+
+def span(name: str):
+    """Time a block under the current request's profile (no-op when not profiling)"""
+    profile = _current.get()
+    return _NOOP if profile is None else profile.span(name)
+
+
+def activate(profile: Profile):
+    return _current.set(profile)
+
+
+def deactivate(token):
+    _current.reset(token)
@@ -0,0 +1,80 @@
+"""
+Local profile store - one JSON file per profiled request (plus the optional
+pyinstrument HTML), newest kept, oldest pruned past PROFILE_MAX_FILES.
+"""
+import json
+import os
+import re
+from typing import List, Optional
+
+from agent.config import settings
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{16}$")
+
+
+class ProfileStore:
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+
+    def _path(self, profile_id: str, ext: str) -> Optional[str]:
+        # Ids come from URLs; never let them escape the directory
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        return os.path.join(self.directory, f"{profile_id}.{ext}")
+
+    def save(self, data: dict, wall_clock_html: Optional[str] = None):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(data["profile_id"], "json"), "w") as f:
+            json.dump(data, f)
+        if wall_clock_html is not None:
+            with open(self._path(data["profile_id"], "html"), "w") as f:
+                f.write(wall_clock_html)
+        self._prune()
+
+    def _prune(self):
+        files = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in files[:max(len(files) - self.max_files, 0)]:
+            for ext in ("json", "html"):
+                path = self._path(entry.name[:-5], ext)
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+    def list(self, limit: int = 50) -> List[dict]:
+        """Summaries, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        files = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True
+        )
+        summaries = []
+        for entry in files[:limit]:
+            with open(entry.path) as f:
+                data = json.load(f)
+            summaries.append({
+                key: data.get(key)
+                for key in ("profile_id", "method", "path", "trigger", "status", "started_at", "total_ms", "has_wall_clock")
+            })
+        return summaries
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        path = self._path(profile_id, "json")
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def get_wall_clock(self, profile_id: str) -> Optional[str]:
+        path = self._path(profile_id, "html")
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return f.read()
+
+
+profile_store = ProfileStore(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 
 
 class ChatRequest(BaseModel):
@@ -9,3 +9,10 @@ class ChatRequest(BaseModel):
 
 class RenameThreadRequest(BaseModel):
     title: str
+
+
+class FeedbackRequest(BaseModel):
+    message_id: str
+    rating: Literal["up", "down"]
+    reasons: List[str] = Field(default_factory=list, max_length=20)
+    comment: Optional[str] = Field(default=None, max_length=2000)
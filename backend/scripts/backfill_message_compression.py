@@ -0,0 +1,106 @@
+"""
+Online backfill: compress existing large assistant messages in chat_messages.
+
+Walks the table in message_id order (keyset pagination on the primary key, so
+every batch is an index range scan), compresses eligible rows in Python and
+writes each batch back in its own short transaction. Safe to run while the app
+is serving traffic, to stop at any time, and to re-run: converted rows are
+skipped, and a row changed underneath a batch is left alone.
+
+Run after migrations/008_compress_large_messages.sql:
+    python scripts/backfill_message_compression.py --batch-size 500 --pause 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+import asyncpg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.config import settings  # noqa: E402
+from persistance.compression import compress_message  # noqa: E402
+
+SELECT_BATCH = f"""
+    SELECT message_id, created_at, message
+    FROM {settings.SCHEMA}.chat_messages
+    WHERE message_id > $1
+      AND role = 'assistant'
+      AND message IS NOT NULL
+      AND octet_length(message) >= $2
+    ORDER BY message_id
+    LIMIT $3
+"""
+
+# Re-checks `message = original` so a concurrent edit is never overwritten
+UPDATE_BATCH = f"""
+    UPDATE {settings.SCHEMA}.chat_messages AS cm
+    SET message = NULL, message_compressed = b.compressed, message_codec = b.codec
+    FROM unnest($1::uuid[], $2::timestamptz[], $3::text[], $4::bytea[], $5::text[])
+        AS b(message_id, created_at, original, compressed, codec)
+    WHERE cm.message_id = b.message_id
+      AND cm.created_at = b.created_at
+      AND cm.message = b.original
+"""
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.2, help="seconds to sleep between batches")
+    parser.add_argument("--start-after", default=str(uuid.UUID(int=0)), help="resume from this message_id")
+    parser.add_argument("--dry-run", action="store_true", help="measure savings without writing")
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(
+        user=settings.pg_user,
+        password=settings.pg_password,
+        database=settings.pg_dbname,
+        host=settings.pg_host,
+        port=settings.pg_port,
+    )
+    last_id = uuid.UUID(args.start_after)
+    scanned = converted = raw_bytes = stored_bytes = 0
+    started = time.perf_counter()
+    try:
+        while True:
+            rows = await conn.fetch(SELECT_BATCH, last_id, settings.MESSAGE_COMPRESS_MIN_BYTES, args.batch_size)
+            if not rows:
+                break
+            last_id = rows[-1]["message_id"]
+            scanned += len(rows)
+
+            batch = ([], [], [], [], [])
+            for row in rows:
+                _, compressed, codec = compress_message(row["message"])
+                if compressed is None:
+                    continue
+                for column, value in zip(batch, (row["message_id"], row["created_at"], row["message"], compressed, codec)):
+                    column.append(value)
+                raw_bytes += len(row["message"].encode("utf-8"))
+                stored_bytes += len(compressed)
+
+            if batch[0] and not args.dry_run:
+                async with conn.transaction():
+                    result = await conn.execute(UPDATE_BATCH, *batch)
+                converted += int(result.split()[-1])
+            elif batch[0]:
+                converted += len(batch[0])
+
+            print(f"scanned {scanned:,}  converted {converted:,}  last message_id {last_id}", flush=True)
+            await asyncio.sleep(args.pause)
+    finally:
+        await conn.close()
+
+    elapsed = time.perf_counter() - started
+    ratio = raw_bytes / stored_bytes if stored_bytes else 0
+    print(
+        f"done in {elapsed:.1f}s: {converted:,} rows {'would be ' if args.dry_run else ''}compressed, "
+        f"{raw_bytes:,} -> {stored_bytes:,} bytes ({ratio:.2f}x)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
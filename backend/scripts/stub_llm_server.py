@@ -0,0 +1,92 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Streams a canned answer word by word so the backend can be exercised without
+calling the real provider. Point the app at it with:
+
+    OPENAI_BASE_URL=http://127.0.0.1:9000/v1 OPENAI_API_KEY=stub
+
+Run:
+    python scripts/stub_llm_server.py --port 9000 --first-token-delay 0.5
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI()
+
+ANSWER = "This is a canned answer from the local stub LLM server."
+config = {"first_token_delay": 0.0, "token_delay": 0.01, "name": "stub"}
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason=None, usage=None) -> str:
+    body = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if usage is None else [],
+    }
+    if usage is not None:
+        body["usage"] = usage
+    return f"data: {json.dumps(body)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    payload = await request.json()
+    model = payload.get("model", "stub")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    words = f"[{config['name']}] {ANSWER}".split(" ")
+    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in payload.get("messages", []))
+    usage = {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(words),
+        "total_tokens": prompt_tokens + len(words),
+    }
+
+    if not payload.get("stream"):
+        await asyncio.sleep(config["first_token_delay"])
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(words)},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    async def generate():
+        await asyncio.sleep(config["first_token_delay"])
+        yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+        for i, word in enumerate(words):
+            yield _chunk(completion_id, model, {"content": word if i == 0 else f" {word}"})
+            await asyncio.sleep(config["token_delay"])
+        yield _chunk(completion_id, model, {}, finish_reason="stop")
+        if payload.get("stream_options", {}).get("include_usage"):
+            yield _chunk(completion_id, model, {}, usage=usage)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--first-token-delay", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds between tokens")
+    parser.add_argument("--name", default="stub", help="tag prepended to answers")
+    args = parser.parse_args()
+    config.update(first_token_delay=args.first_token_delay, token_delay=args.token_delay, name=args.name)
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,79 @@
+"""
+Train a zstd dictionary on our own assistant answers for message compression.
+
+Samples recent assistant messages, trains a dictionary and writes it as a
+.zdict file. Point MESSAGE_ZSTD_DICT_PATH at it to compress new messages
+with it; keep older .zdict files in the same directory so rows written with
+them stay readable (each frame records its dictionary id).
+
+    python scripts/train_message_dictionary.py --sample 5000 --out dicts/messages-v2.zdict
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+import asyncpg
+import zstandard
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.config import settings  # noqa: E402
+from persistance.compression import message_text  # noqa: E402
+
+SAMPLE_QUERY = f"""
+    SELECT message, message_compressed, message_codec
+    FROM {settings.SCHEMA}.chat_messages
+    WHERE role = 'assistant' AND is_deleted = false
+    ORDER BY created_at DESC
+    LIMIT $1
+"""
+
+
+def ratio(samples, level: int, dictionary=None) -> float:
+    compressor = zstandard.ZstdCompressor(level=level, dict_data=dictionary)
+    raw = sum(len(s) for s in samples)
+    return raw / sum(len(compressor.compress(s)) for s in samples)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sample", type=int, default=5000, help="number of recent assistant messages")
+    parser.add_argument("--size", type=int, default=112 * 1024, help="dictionary size in bytes")
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(
+        user=settings.pg_user,
+        password=settings.pg_password,
+        database=settings.pg_dbname,
+        host=settings.pg_host,
+        port=settings.pg_port,
+    )
+    try:
+        rows = await conn.fetch(SAMPLE_QUERY, args.sample)
+    finally:
+        await conn.close()
+
+    samples = [message_text(row).encode("utf-8") for row in rows]
+    if len(samples) < 100:
+        sys.exit(f"Only {len(samples)} assistant messages found; need at least 100 to train")
+
+    # Hold out every 10th message to check the dictionary generalizes
+    held_out = samples[::10]
+    training = [s for i, s in enumerate(samples) if i % 10]
+    dictionary = zstandard.train_dictionary(args.size, training, level=settings.MESSAGE_ZSTD_LEVEL)
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "wb") as f:
+        f.write(dictionary.as_bytes())
+
+    large = [s for s in held_out if len(s) >= settings.MESSAGE_COMPRESS_MIN_BYTES] or held_out
+    print(f"wrote {args.out}: dict_id {dictionary.dict_id()}, {len(dictionary.as_bytes()):,} bytes, "
+          f"trained on {len(training):,} messages")
+    print(f"held-out ratio (>= {settings.MESSAGE_COMPRESS_MIN_BYTES} bytes, {len(large)} messages): "
+          f"zstd {ratio(large, settings.MESSAGE_ZSTD_LEVEL):.2f}x, "
+          f"zstd+dict {ratio(large, settings.MESSAGE_ZSTD_LEVEL, dictionary):.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
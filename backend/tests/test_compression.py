@@ -0,0 +1,116 @@
+import base64
+import random
+
+import pytest
+import zstandard
+
+from agent.config import settings
+from persistance import compression
+from persistance.compression import ZSTD_CODEC, compress_message, decompress_base64, decompress_message, message_text
+
+TOPICS = ["lasagna", "quantum fields", "tax returns", "marathon training", "sourdough", "python lists"]
+
+
+def answer(seed: int) -> str:
+    rng = random.Random(seed)
+    topic = rng.choice(TOPICS)
+    steps = "\n".join(f"{i}. Step {i} for {topic}: {rng.choice(TOPICS)} and more detail" for i in range(1, 40))
+    return f"## {topic.title()}\n\nHere is an overview of **{topic}**.\n\n{steps}\n\nHope this helps with {topic}!"
+
+
+def row(message, compressed=None, codec=None) -> dict:
+    return {"message": message, "message_compressed": compressed, "message_codec": codec}
+
+
+def write_dictionary(path, seed: int):
+    samples = [answer(seed * 1000 + i).encode("utf-8") for i in range(300)]
+    dictionary = zstandard.train_dictionary(4096, samples, dict_id=seed)
+    path.write_bytes(dictionary.as_bytes())
+
+
+@pytest.fixture
+def no_dictionary(monkeypatch):
+    monkeypatch.setattr(settings, "MESSAGE_COMPRESSION", ZSTD_CODEC)
+    monkeypatch.setattr(compression, "_active_dict", None)
+    monkeypatch.setattr(compression, "_dictionaries", {})
+
+
+def use_dictionary(monkeypatch, path):
+    monkeypatch.setattr(settings, "MESSAGE_COMPRESSION", ZSTD_CODEC)
+    monkeypatch.setattr(settings, "MESSAGE_ZSTD_DICT_PATH", str(path))
+    active, known = compression._load_dictionaries()
+    monkeypatch.setattr(compression, "_active_dict", active)
+    monkeypatch.setattr(compression, "_dictionaries", known)
+
+
+def test_short_message_stays_plain(no_dictionary):
+    text = "x" * (settings.MESSAGE_COMPRESS_MIN_BYTES - 1)
+    assert compress_message(text) == (text, None, None)
+    assert message_text(row(text)) == text
+
+
+def test_message_that_barely_shrinks_stays_plain(monkeypatch, no_dictionary):
+    # Frame overhead outweighs the savings on a short, varied message
+    monkeypatch.setattr(settings, "MESSAGE_COMPRESS_MIN_BYTES", 16)
+    text = "The quick brown fox jumps over the lazy dog"
+    assert compress_message(text) == (text, None, None)
+
+
+def test_compression_disabled_keeps_plain_text(monkeypatch, no_dictionary):
+    monkeypatch.setattr(settings, "MESSAGE_COMPRESSION", "none")
+    text = answer(1) * 5
+    assert compress_message(text) == (text, None, None)
+
+
+def test_large_message_round_trips(no_dictionary):
+    text = answer(1) * 5
+    message, compressed, codec = compress_message(text)
+    assert message is None
+    assert codec == ZSTD_CODEC
+    assert len(compressed) < len(text.encode("utf-8"))
+    assert zstandard.get_frame_parameters(compressed).dict_id == 0
+    assert message_text(row(message, compressed, codec)) == text
+    # asyncpg hands bytea back as bytes, JSON-rendered rows as base64
+    assert decompress_base64(base64.b64encode(compressed).decode(), codec) == text
+
+
+def test_dictionary_frames_record_their_id(monkeypatch, tmp_path):
+    write_dictionary(tmp_path / "v1.zdict", seed=1)
+    use_dictionary(monkeypatch, tmp_path / "v1.zdict")
+
+    text = answer(7)
+    _, compressed, codec = compress_message(text)
+    assert zstandard.get_frame_parameters(compressed).dict_id == 1
+    assert message_text(row(None, compressed, codec)) == text
+
+
+def test_rotated_dictionary_still_reads_old_rows(monkeypatch, tmp_path):
+    write_dictionary(tmp_path / "v1.zdict", seed=1)
+    use_dictionary(monkeypatch, tmp_path / "v1.zdict")
+    text = answer(7)
+    _, old, codec = compress_message(text)
+
+    # v2 becomes the active dictionary; v1 sits next to it for reads
+    write_dictionary(tmp_path / "v2.zdict", seed=2)
+    use_dictionary(monkeypatch, tmp_path / "v2.zdict")
+    _, new, _ = compress_message(text)
+
+    assert zstandard.get_frame_parameters(new).dict_id == 2
+    assert decompress_message(old, codec) == text
+    assert decompress_message(new, codec) == text
+
+
+def test_unknown_dictionary_is_an_error(monkeypatch, tmp_path):
+    write_dictionary(tmp_path / "v1.zdict", seed=1)
+    use_dictionary(monkeypatch, tmp_path / "v1.zdict")
+    _, compressed, codec = compress_message(answer(7))
+
+    monkeypatch.setattr(compression, "_active_dict", None)
+    monkeypatch.setattr(compression, "_dictionaries", {})
+    with pytest.raises(ValueError, match="unknown dictionary 1"):
+        decompress_message(compressed, codec)
+
+
+def test_unknown_codec_is_an_error(no_dictionary):
+    with pytest.raises(ValueError, match="Unknown message codec"):
+        decompress_message(b"", "lz4")
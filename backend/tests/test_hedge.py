@@ -0,0 +1,131 @@
+import asyncio
+from typing import Any, List
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from agent import hedge
+from agent.config import settings
+from agent.hedge import HedgeBudget, HedgedChatModel, HedgeStats
+
+
+class StubChatModel(BaseChatModel):
+    """Streams `text` one character at a time after `delay` seconds, or fails"""
+
+    model_name: str
+    text: str = "ok"
+    delay: float = 0.0
+    fail: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.text))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.model_name} unavailable")
+        for char in self.text:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=char))
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    monkeypatch.setattr(settings, "HEDGE_AFTER_MS", 20)
+    monkeypatch.setattr(hedge, "hedge_budget", HedgeBudget(rate=0.05, burst=5))
+    stats = HedgeStats()
+    monkeypatch.setattr(hedge, "hedge_stats", stats)
+    return stats
+
+
+def stream(primary: StubChatModel, backup: StubChatModel) -> List[ChatGenerationChunk]:
+    model = HedgedChatModel(primary=primary, hedge=backup, model_name=primary.model_name)
+
+    async def collect():
+        return [chunk async for chunk in model._astream([HumanMessage(content="hi")])]
+    return asyncio.run(collect())
+
+
+def served(chunks: List[ChatGenerationChunk]) -> tuple:
+    metadata = chunks[0].message.response_metadata
+    text = "".join(chunk.message.content for chunk in chunks)
+    return metadata["served_by"], metadata["served_model"], text
+
+
+def test_fast_primary_is_not_hedged(stats):
+    chunks = stream(
+        StubChatModel(model_name="primary", text="first"),
+        StubChatModel(model_name="backup", text="second"),
+    )
+    assert served(chunks) == ("primary", "primary", "first")
+    assert stats.requests == 1
+    assert stats.hedges_fired == 0
+
+
+def test_hedge_wins_when_primary_is_slow(stats):
+    chunks = stream(
+        StubChatModel(model_name="primary", text="first", delay=1),
+        StubChatModel(model_name="backup", text="second"),
+    )
+    assert served(chunks) == ("hedge", "backup", "second")
+    assert stats.hedges_fired == 1
+    assert stats.hedge_wins == 1
+    # Only the first chunk carries the metadata, so merged chunks don't repeat it
+    assert all("served_by" not in chunk.message.response_metadata for chunk in chunks[1:])
+
+
+def test_primary_can_still_win_after_hedge_fires(stats):
+    chunks = stream(
+        StubChatModel(model_name="primary", text="first", delay=0.05),
+        StubChatModel(model_name="backup", text="second", delay=1),
+    )
+    assert served(chunks) == ("primary", "primary", "first")
+    assert stats.hedges_fired == 1
+    assert stats.primary_wins == 1
+
+
+def test_failed_leg_fails_over_to_the_other(stats):
+    chunks = stream(
+        StubChatModel(model_name="primary", delay=0.05, fail=True),
+        StubChatModel(model_name="backup", text="second", delay=0.15),
+    )
+    assert served(chunks) == ("hedge", "backup", "second")
+    assert stats.failovers == 1
+
+
+def test_both_legs_failing_raises(stats):
+    with pytest.raises(RuntimeError, match="primary unavailable"):
+        stream(
+            StubChatModel(model_name="primary", delay=0.05, fail=True),
+            StubChatModel(model_name="backup", delay=0.1, fail=True),
+        )
+
+
+def test_exhausted_budget_waits_on_primary(stats, monkeypatch):
+    monkeypatch.setattr(hedge, "hedge_budget", HedgeBudget(rate=0.05, burst=0))
+    chunks = stream(
+        StubChatModel(model_name="primary", text="first", delay=0.1),
+        StubChatModel(model_name="backup", text="second"),
+    )
+    assert served(chunks) == ("primary", "primary", "first")
+    assert stats.hedges_fired == 0
+    assert stats.budget_denied == 1
+
+
+def test_budget_refills_at_rate_up_to_burst():
+    budget = HedgeBudget(rate=0.5, burst=1)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.earn()
+    assert not budget.try_spend()
+    budget.earn()
+    assert budget.try_spend()
+    for _ in range(10):
+        budget.earn()
+    assert budget.try_spend()
+    assert not budget.try_spend()
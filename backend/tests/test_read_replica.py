@@ -0,0 +1,113 @@
+"""
+Read-your-writes routing between the primary and a streaming replica.
+
+Needs two real Postgres instances, the second replicating from the first,
+and a superuser on the replica (to pause WAL replay):
+    PG_TEST_PRIMARY_DSN=postgresql://postgres@localhost:5432/postgres \
+    PG_TEST_REPLICA_DSN=postgresql://postgres@localhost:5433/postgres \
+    python -m pytest tests/test_read_replica.py
+Skipped when either DSN is unset.
+"""
+import asyncio
+import os
+import time
+import uuid
+
+import asyncpg
+import pytest
+
+from agent.config import settings
+from db.pool import Database
+
+PRIMARY_DSN = os.getenv("PG_TEST_PRIMARY_DSN")
+REPLICA_DSN = os.getenv("PG_TEST_REPLICA_DSN")
+
+pytestmark = pytest.mark.skipif(
+    not (PRIMARY_DSN and REPLICA_DSN),
+    reason="PG_TEST_PRIMARY_DSN and PG_TEST_REPLICA_DSN not set",
+)
+
+
+def run(test):
+    """Run an async test body against a fresh Database wired to both instances"""
+    async def wrapper():
+        database = Database()
+        database.pool = await asyncpg.create_pool(PRIMARY_DSN, min_size=1, max_size=2)
+        database.read_pool = await asyncpg.create_pool(REPLICA_DSN, min_size=1, max_size=2)
+        try:
+            await test(database)
+        finally:
+            # Never leave the replica paused for the next test
+            await database.read_pool.execute("SELECT pg_wal_replay_resume()")
+            await database.read_pool.close()
+            await database.pool.close()
+    asyncio.run(wrapper())
+
+
+async def write(database: Database, user_id: str):
+    """A primary write that advances the WAL, recorded the way the app records it"""
+    async with database.pool.acquire() as conn:
+        # Catalog changes are WAL-logged and flushed on commit, even for a temp table
+        await conn.execute("CREATE TEMP TABLE read_replica_test (id uuid); DROP TABLE read_replica_test")
+        await database.mark_write(conn, user_id)
+
+
+async def wait_for_replay(database: Database, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    async with database.pool.acquire() as conn:
+        target = await conn.fetchval("SELECT pg_current_wal_lsn()")
+    while time.monotonic() < deadline:
+        caught_up = await database.read_pool.fetchval(
+            "SELECT pg_last_wal_replay_lsn() >= $1::pg_lsn", target
+        )
+        if caught_up:
+            return
+        await asyncio.sleep(0.05)
+    pytest.fail("replica did not catch up")
+
+
+def test_replica_is_a_standby():
+    async def body(database):
+        assert await database.read_pool.fetchval("SELECT pg_is_in_recovery()")
+        assert not await database.pool.fetchval("SELECT pg_is_in_recovery()")
+    run(body)
+
+
+def test_reads_without_recent_write_use_replica():
+    async def body(database):
+        assert await database.reader(str(uuid.uuid4())) is database.read_pool
+        assert await database.reader(None) is database.read_pool
+    run(body)
+
+
+def test_read_after_write_uses_primary_until_replica_catches_up():
+    async def body(database):
+        user_id = str(uuid.uuid4())
+        await database.read_pool.execute("SELECT pg_wal_replay_pause()")
+        await write(database, user_id)
+        await asyncio.sleep(settings.REPLICA_LSN_CACHE_SECONDS * 2)
+        assert await database.reader(user_id) is database.pool
+        # Other users are unaffected
+        assert await database.reader(str(uuid.uuid4())) is database.read_pool
+
+        await database.read_pool.execute("SELECT pg_wal_replay_resume()")
+        await wait_for_replay(database)
+        await asyncio.sleep(settings.REPLICA_LSN_CACHE_SECONDS * 2)
+        assert await database.reader(user_id) is database.read_pool
+    run(body)
+
+
+def test_read_after_write_falls_back_to_replica_when_window_expires(monkeypatch):
+    monkeypatch.setattr(settings, "READ_YOUR_WRITES_WINDOW", 0.3)
+
+    async def body(database):
+        user_id = str(uuid.uuid4())
+        await database.read_pool.execute("SELECT pg_wal_replay_pause()")
+        await write(database, user_id)
+        await asyncio.sleep(settings.REPLICA_LSN_CACHE_SECONDS * 2)
+        assert await database.reader(user_id) is database.pool
+
+        await asyncio.sleep(0.4)
+        # Replay is still paused: only the window expiring moves the read back
+        assert await database.reader(user_id) is database.read_pool
+    run(body)
@@ -0,0 +1,30 @@
+import pytest
+
+from agent.router import FAST_TIER, FULL_TIER, classify_turn
+
+
+@pytest.mark.parametrize("message", [
+    "hi",
+    "Hello there 👋",
+    "ok thanks!",
+    "thank you so much :)",
+    "good morning!!",
+    "haha nice",
+    "what's up?",
+])
+def test_small_talk_routes_fast(message):
+    assert classify_turn(message) == FAST_TIER
+
+
+# Greetings in front of a real request must not pull it into the fast tier
+@pytest.mark.parametrize("message", [
+    "hi, what is the capital of France?",
+    "hey can you give me a recipe for lasagna",
+    "ok so what should I invest my savings in",
+    "thanks! now tell me about quantum field theory in detail please",
+    "hello world",
+    "thanks for nothing",
+    "how do I reverse a list",
+])
+def test_real_questions_route_full(message):
+    assert classify_turn(message) == FULL_TIER
@@ -0,0 +1,43 @@
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from agent.serde import ZSTD_SUFFIX, CompressedSerializer
+
+LONG_THREAD = {
+    "messages": [
+        HumanMessage(content="tell me about the weather " * 50),
+        AIMessage(content="it is sunny with a light breeze " * 200),
+    ]
+}
+
+
+def test_large_payload_is_compressed_and_round_trips():
+    serde = CompressedSerializer(min_bytes=1024)
+    plain_type, plain = JsonPlusSerializer().dumps_typed(LONG_THREAD)
+    type_, data = serde.dumps_typed(LONG_THREAD)
+
+    assert type_ == plain_type + ZSTD_SUFFIX
+    assert len(data) < len(plain)
+    assert serde.loads_typed((type_, data)) == LONG_THREAD
+
+
+def test_small_payload_is_left_alone():
+    serde = CompressedSerializer(min_bytes=1024)
+    small = {"messages": [HumanMessage(content="hi")]}
+    assert serde.dumps_typed(small) == JsonPlusSerializer().dumps_typed(small)
+
+
+def test_rows_written_before_compression_still_load():
+    # Checkpoints stored by the stock serializer carry plain type tags
+    legacy = JsonPlusSerializer().dumps_typed(LONG_THREAD)
+    assert not legacy[0].endswith(ZSTD_SUFFIX)
+    assert CompressedSerializer(min_bytes=1024).loads_typed(legacy) == LONG_THREAD
+
+
+def test_compression_off_still_reads_compressed_rows():
+    # CHECKPOINT_COMPRESSION=none stops writing "+zstd" rows but must keep reading them
+    stored = CompressedSerializer(min_bytes=1024).dumps_typed(LONG_THREAD)
+    serde = CompressedSerializer(min_bytes=1024, compress=False)
+
+    assert serde.dumps_typed(LONG_THREAD) == JsonPlusSerializer().dumps_typed(LONG_THREAD)
+    assert serde.loads_typed(stored) == LONG_THREAD
@@ -0,0 +1,135 @@
+import asyncio
+import sys
+import types
+
+import pytest
+
+try:
+    import agent.builder  # noqa: F401
+except ImportError:
+    # agent.builder needs the Postgres checkpointer; every test here replaces
+    # agent_service with a stub anyway
+    sys.modules["agent.builder"] = types.SimpleNamespace(agent_service=None)
+
+from agent import turns
+from agent.turns import IdempotencyKeyReused, TurnRegistry, request_fingerprint
+
+
+def collect(run):
+    async def gather():
+        return [chunk async for chunk in run.subscribe()]
+    return gather()
+
+
+def test_retry_attaches_and_replays_without_rerunning(monkeypatch):
+    calls = []
+
+    async def body():
+        release = asyncio.Event()
+
+        async def agent_service(request):
+            calls.append(request["user_message"])
+            yield {"type": "token", "content": "Hel"}
+            await release.wait()
+            yield {"type": "token", "content": "lo"}
+            yield {"type": "end"}
+
+        monkeypatch.setattr(turns, "agent_service", agent_service)
+        registry = TurnRegistry(ttl=60, max_runs=10)
+        fingerprint = request_fingerprint("t1", "hi")
+        run = registry.start("k", {"thread_id": "t1", "user_message": "hi"}, fingerprint)
+        await asyncio.sleep(0.01)
+
+        # Attaches mid-run and still sees the chunk streamed before it joined
+        retry = registry.start("k", {"thread_id": "t1", "user_message": "hi"}, fingerprint)
+        assert retry is run
+        live = asyncio.create_task(collect(retry))
+        await asyncio.sleep(0.01)
+        release.set()
+        assert await live == [
+            {"type": "token", "content": "Hel"},
+            {"type": "token", "content": "lo"},
+            {"type": "end"},
+        ]
+
+        # After completion the stored (compacted) result is replayed
+        stored = registry.start("k", {"thread_id": "t1", "user_message": "hi"}, fingerprint)
+        assert stored is run
+        assert await collect(stored) == [{"type": "token", "content": "Hello"}, {"type": "end"}]
+        assert calls == ["hi"]
+
+    asyncio.run(body())
+
+
+def test_key_reused_for_different_request_is_rejected(monkeypatch):
+    async def agent_service(body):
+        yield {"type": "end"}
+
+    monkeypatch.setattr(turns, "agent_service", agent_service)
+
+    async def body():
+        registry = TurnRegistry(ttl=60, max_runs=10)
+        run = registry.start("k", {"thread_id": "t1"}, request_fingerprint("t1", "hi"))
+        await run.task
+        with pytest.raises(IdempotencyKeyReused):
+            registry.start("k", {"thread_id": "t1"}, request_fingerprint("t1", "something else"))
+        with pytest.raises(IdempotencyKeyReused):
+            registry.start("k", {"thread_id": "t2"}, request_fingerprint("t2", "hi"))
+
+    asyncio.run(body())
+
+
+def test_turns_on_one_thread_never_interleave(monkeypatch):
+    log = []
+
+    async def agent_service(body):
+        log.append(("start", body["user_message"]))
+        for _ in range(3):
+            await asyncio.sleep(0.005)
+            yield {"type": "token", "content": body["user_message"]}
+        log.append(("end", body["user_message"]))
+
+    monkeypatch.setattr(turns, "agent_service", agent_service)
+
+    async def body():
+        registry = TurnRegistry(ttl=60, max_runs=10)
+        first = registry.start("a", {"thread_id": "t1", "user_message": "a"})
+        second = registry.start("b", {"thread_id": "t1", "user_message": "b"})
+        other = registry.start("c", {"thread_id": "t2", "user_message": "c"})
+        await asyncio.gather(first.task, second.task, other.task)
+
+        same_thread = [entry for entry in log if entry[1] in ("a", "b")]
+        assert same_thread == [("start", "a"), ("end", "a"), ("start", "b"), ("end", "b")]
+        # Other threads are not held up by t1's lock
+        assert log.index(("start", "c")) < log.index(("end", "a"))
+        # Locks are dropped once nobody is waiting on them
+        assert registry._thread_locks == {}
+
+    asyncio.run(body())
+
+
+def test_failed_run_is_not_stored(monkeypatch):
+    calls = []
+
+    async def agent_service(body):
+        calls.append(body["user_message"])
+        if len(calls) == 1:
+            raise RuntimeError("upstream timed out")
+        yield {"type": "end"}
+
+    monkeypatch.setattr(turns, "agent_service", agent_service)
+
+    async def body():
+        registry = TurnRegistry(ttl=60, max_runs=10)
+        fingerprint = request_fingerprint("t1", "hi")
+        run = registry.start("k", {"thread_id": "t1", "user_message": "hi"}, fingerprint)
+        assert await collect(run) == [{"type": "error", "error": "upstream timed out"}]
+        assert registry.get("k", fingerprint) is None
+
+        # A retry with the same key runs the turn again
+        retry = registry.start("k", {"thread_id": "t1", "user_message": "hi"}, fingerprint)
+        assert retry is not run
+        assert await collect(retry) == [{"type": "end"}]
+        assert calls == ["hi", "hi"]
+
+    asyncio.run(body())
@@ -0,0 +1,211 @@
+"""
+WebSocket chat transport - many turns, many threads, one connection.
+
+Protocol (JSON text frames):
+
+  client -> server
+    {"type": "auth", "token": "<jwt>"}                        first frame (or ?token=)
+    {"type": "chat", "turn_id": "...", "threadId": "...", "message": "..."}
+    {"type": "ack", "turn_id": "...", "count": n}             grant n more chunks for a turn
+    {"type": "cancel", "turn_id": "..."}                      stop streaming a turn (generation continues)
+    {"type": "ping"}
+
+  server -> client
+    {"type": "auth_ok", "user": {...}, "window": n}
+    {"type": "token" | "end", "turn_id": "...", ...}          agent_service chunks, tagged by turn
+    {"type": "turn_done", "turn_id": "..."}
+    {"type": "thread_title", "thread_id": "...", "title": "..."}
+    {"type": "error", "turn_id"?: "...", "error": "..."}
+    {"type": "pong"}
+
+Flow control is credit based: each turn may have `window` unacknowledged
+chunks in flight; the client tops it up with "ack" frames. Acks never raise
+a turn's outstanding credit above `window`; any excess is dropped. Generation
+itself is not paused - the turn run buffers chunks - only delivery waits.
+Turns go through the same turn registry as /chat/stream, so a turn_id
+resent after a reconnect attaches to the running turn. The same holds after
+"cancel": the turn_id stays bound to its message, resending the same chat
+frame replays the turn from its first chunk, and a new message needs a new
+turn_id.
+"""
+import asyncio
+import json
+import uuid
+from typing import Dict
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+
+from agent.config import settings
+from agent.events import user_events
+from agent.turns import IdempotencyKeyReused, request_fingerprint, turn_registry
+from auth.dependencies import authenticate_token
+
+router = APIRouter()
+
+# Policy-violation style close codes in the private 4000 range
+WS_CLOSE_UNAUTHORIZED = 4401
+WS_CLOSE_AUTH_TIMEOUT = 4408
+
+
+class ChatConnection:
+    """State for one authenticated WebSocket connection"""
+
+    def __init__(self, websocket: WebSocket, user: dict):
+        self.websocket = websocket
+        self.user = user
+        self.outbound: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.turns: Dict[str, asyncio.Task] = {}
+        self.credits: Dict[str, asyncio.BoundedSemaphore] = {}
+
+    async def send(self, frame: dict):
+        # Bounded queue: producers wait when the socket can't keep up
+        await self.outbound.put(frame)
+
+    async def writer(self):
+        while True:
+            frame = await self.outbound.get()
+            await self.websocket.send_text(json.dumps(frame))
+
+    async def push_events(self):
+        queue = user_events.subscribe(self.user["user_id"])
+        try:
+            while True:
+                await self.send(await queue.get())
+        finally:
+            user_events.unsubscribe(self.user["user_id"], queue)
+
+    def start_turn(self, frame: dict):
+        turn_id = str(frame.get("turn_id") or uuid.uuid4())
+        message = frame.get("message")
+        error = None
+        if not isinstance(message, str) or not message:
+            error = "message is required"
+        elif turn_id in self.turns:
+            error = "turn_id already active"
+        elif len(self.turns) >= settings.WS_MAX_ACTIVE_TURNS:
+            error = "too many active turns"
+        if error:
+            self.send_nowait({"type": "error", "turn_id": turn_id, "error": error})
+            return
+
+        user_id = self.user["user_id"]
+        try:
+            run = turn_registry.start(f"{user_id}:{turn_id}", {
+                "user_id": user_id,
+                "thread_id": frame.get("threadId") or str(uuid.uuid4()),
+                "parent_id": str(uuid.uuid4()),
+                "user_message": message,
+                "persist": True
+            }, request_fingerprint(frame.get("threadId"), message))
+        except IdempotencyKeyReused:
+            self.send_nowait({"type": "error", "turn_id": turn_id, "error": "turn_id already used for a different message"})
+            return
+        self.credits[turn_id] = asyncio.BoundedSemaphore(settings.WS_TURN_WINDOW)
+        task = asyncio.create_task(self._pump(turn_id, run))
+        self.turns[turn_id] = task
+        task.add_done_callback(lambda _: self._forget(turn_id))
+
+    async def _pump(self, turn_id: str, run):
+        credits = self.credits[turn_id]
+        async for chunk in run.subscribe():
+            await credits.acquire()
+            await self.send({**chunk, "turn_id": turn_id})
+        await self.send({"type": "turn_done", "turn_id": turn_id, "thread_id": run.thread_id})
+
+    def _forget(self, turn_id: str):
+        self.turns.pop(turn_id, None)
+        self.credits.pop(turn_id, None)
+
+    def ack(self, frame: dict):
+        credits = self.credits.get(str(frame.get("turn_id")))
+        if credits is None:
+            return
+        count = frame.get("count", 1)
+        if not isinstance(count, int) or count < 1:
+            return
+        for _ in range(min(count, settings.WS_TURN_WINDOW)):
+            try:
+                credits.release()
+            except ValueError:
+                # Already holding a full window; extra credit is dropped
+                break
+
+    def cancel(self, frame: dict):
+        # Stops delivery only; the turn still completes and is persisted, and
+        # resending its chat frame replays it from the registry
+        task = self.turns.get(str(frame.get("turn_id")))
+        if task is not None:
+            task.cancel()
+
+    def send_nowait(self, frame: dict):
+        try:
+            self.outbound.put_nowait(frame)
+        except asyncio.QueueFull:
+            pass
+
+    async def close(self):
+        for task in list(self.turns.values()):
+            task.cancel()
+
+
+async def _authenticate(websocket: WebSocket) -> dict:
+    token = websocket.query_params.get("token")
+    if not token:
+        frame = await asyncio.wait_for(websocket.receive_json(), timeout=settings.WS_AUTH_TIMEOUT)
+        if frame.get("type") != "auth":
+            raise HTTPException(status_code=401, detail="First frame must be auth")
+        token = frame.get("token") or ""
+    return await authenticate_token(token)
+
+
+@router.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket):
+    """
+    Multiplexed chat over one WebSocket: authenticates once, then carries any
+    number of turns (keyed by turn_id) across threads.
+    """
+    await websocket.accept()
+    try:
+        user = await _authenticate(websocket)
+    except asyncio.TimeoutError:
+        await websocket.close(code=WS_CLOSE_AUTH_TIMEOUT)
+        return
+    except (HTTPException, ValueError, AttributeError):
+        await websocket.close(code=WS_CLOSE_UNAUTHORIZED)
+        return
+    except WebSocketDisconnect:
+        return
+
+    connection = ChatConnection(websocket, user)
+    writer = asyncio.create_task(connection.writer())
+    pusher = asyncio.create_task(connection.push_events())
+    await connection.send({"type": "auth_ok", "user": user, "window": settings.WS_TURN_WINDOW})
+
+    try:
+        while True:
+            try:
+                frame = await websocket.receive_json()
+            except (json.JSONDecodeError, KeyError, TypeError):
+                connection.send_nowait({"type": "error", "error": "invalid frame"})
+                continue
+            if not isinstance(frame, dict):
+                connection.send_nowait({"type": "error", "error": "invalid frame"})
+                continue
+
+            kind = frame.get("type")
+            if kind == "chat":
+                connection.start_turn(frame)
+            elif kind == "ack":
+                connection.ack(frame)
+            elif kind == "cancel":
+                connection.cancel(frame)
+            elif kind == "ping":
+                connection.send_nowait({"type": "pong"})
+            else:
+                connection.send_nowait({"type": "error", "error": f"unknown frame type: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await connection.close()
+        writer.cancel()
+        pusher.cancel()
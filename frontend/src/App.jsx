@@ -7,7 +7,7 @@ import FeedbackModal from './components/FeedbackModal'
 import AuthModal from './components/AuthModal'
 
 // const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://127.0.0.1:8000'
-const API_BASE_URL = import.meta.env.VITE_API_BASE_URL ||'https://orion-699590545294.asia-south1.run.app'
+export const API_BASE_URL = import.meta.env.VITE_API_BASE_URL ||'https://orion-699590545294.asia-south1.run.app'
 
 // Rate limit for anonymous users (can be overridden by backend response)
 const DEFAULT_RATE_LIMIT = 40
@@ -79,6 +79,38 @@ const api = {
     if (res.status === 401) throw new Error('AUTH_EXPIRED')
     if (!res.ok) throw new Error('Failed to delete thread')
     return res.json()
+  },
+
+  async createShare(threadId) {
+    const res = await fetch(
+      `${API_BASE_URL}/conversations/${threadId}/share`,
+      {
+        method: 'POST',
+        headers: this.getHeaders()
+      }
+    )
+    if (res.status === 401) throw new Error('AUTH_EXPIRED')
+    if (!res.ok) throw new Error('Failed to create share link')
+    return res.json()
+  },
+
+  async submitFeedback(messageId, rating, feedback = null) {
+    const res = await fetch(
+      `${API_BASE_URL}/feedback`,
+      {
+        method: 'POST',
+        headers: this.getHeaders(),
+        body: JSON.stringify({
+          message_id: messageId,
+          rating,
+          reasons: feedback?.options || [],
+          comment: feedback?.additionalFeedback || null
+        })
+      }
+    )
+    if (res.status === 401) throw new Error('AUTH_EXPIRED')
+    if (!res.ok) throw new Error('Failed to submit feedback')
+    return res.json()
   }
 }
 
@@ -138,6 +170,7 @@ function App() {
   const [sidebarOpen, setSidebarOpen] = useState(true)
   const [isTyping, setIsTyping] = useState(false)
   const [shareModalOpen, setShareModalOpen] = useState(false)
+  const [shareLink, setShareLink] = useState('')
   const [feedbackModal, setFeedbackModal] = useState({ open: false, messageId: null })
   const [rateLimitInfo, setRateLimitInfo] = useState(null) // { remaining: number, limit: number } for anonymous users
 
@@ -348,7 +381,8 @@ function App() {
     try {
       const response = await fetch(`${API_BASE_URL}/chat/stream`, {
         method: 'POST',
-        headers: api.getHeaders(),
+        // Same key on retry lets the backend attach to / replay this turn instead of re-running it
+        headers: { ...api.getHeaders(), 'Idempotency-Key': aiMessageId },
         body: JSON.stringify({
           threadId: activeThreadId,
           message: content.trim()
@@ -412,6 +446,20 @@ function App() {
                 token = data.token || data.content || data.text || ''
               }
               
+              // Swap the client-side placeholder id for the persisted message id
+              if (data.type === 'end' && data.message_id) {
+                const serverMessageId = data.message_id
+                setThreads(prev => prev.map(t => t.id === activeThreadId
+                  ? {
+                      ...t,
+                      messages: t.messages.map(m =>
+                        m.id === aiMessageId ? { ...m, id: serverMessageId } : m
+                      )
+                    }
+                  : t
+                ))
+              }
+
               // Track remaining questions for anonymous users
               if (data.remaining_questions !== undefined && !user) {
                 setRateLimitInfo({ remaining: data.remaining_questions, limit: data.limit || DEFAULT_RATE_LIMIT })
@@ -516,8 +564,13 @@ function App() {
           m.id === messageId ? { ...m, rating } : m
         )
       })))
+      if (user && rating === 'up') {
+        api.submitFeedback(messageId, 'up').catch(error => {
+          console.error('Failed to submit feedback:', error)
+        })
+      }
     }
-  }, [])
+  }, [user])
 
   const submitFeedback = useCallback((messageId, feedback) => {
     setThreads(prev => prev.map(t => ({
@@ -527,10 +580,17 @@ function App() {
       )
     })))
     setFeedbackModal({ open: false, messageId: null })
-  }, [])
+    // Only persisted (signed-in) conversations have server-side message ids
+    if (user) {
+      api.submitFeedback(messageId, 'down', feedback).catch(error => {
+        console.error('Failed to submit feedback:', error)
+      })
+    }
+  }, [user])
 
   const getShareableLink = useCallback(() => {
     if (!activeThread) return ''
+    // Anonymous threads only live in localStorage, so encode them into the URL
     try {
       const shareData = {
         title: activeThread.title,
@@ -548,6 +608,27 @@ function App() {
     }
   }, [activeThread])
 
+  const openShareModal = useCallback(async () => {
+    setShareModalOpen(true)
+    if (!user || !activeThread || activeThread.id === WELCOME_THREAD_ID) {
+      setShareLink(getShareableLink())
+      return
+    }
+    // Authenticated threads are snapshotted server-side and shared by short id
+    setShareLink('')
+    try {
+      const data = await api.createShare(activeThread.id)
+      setShareLink(`${window.location.origin}/share/${data.share_id}`)
+    } catch (error) {
+      if (error.message === 'AUTH_EXPIRED') {
+        handleAuthExpired()
+        return
+      }
+      console.error('Failed to create share link:', error)
+      setShareLink(getShareableLink())
+    }
+  }, [user, activeThread, getShareableLink, handleAuthExpired])
+
   // Auth handlers
   const handleAuthSuccess = useCallback((userData, token) => {
     setUser(userData)
@@ -587,7 +668,7 @@ function App() {
         onToggle={() => setSidebarOpen(!sidebarOpen)}
         isDarkMode={isDarkMode}
         onToggleTheme={() => setIsDarkMode(!isDarkMode)}
-        onShare={() => setShareModalOpen(true)}
+        onShare={openShareModal}
         isLoading={isLoadingThreads}
         user={user}
         onLogin={openAuthModal}
@@ -612,7 +693,7 @@ function App() {
       <ShareModal 
         isOpen={shareModalOpen}
         onClose={() => setShareModalOpen(false)}
-        shareLink={getShareableLink()}
+        shareLink={shareLink}
         isDarkMode={isDarkMode}
       />
 
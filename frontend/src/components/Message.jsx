@@ -187,19 +187,21 @@ const Message = ({ message, isDarkMode, onRate }) => {
 
         {/* Meta & Actions */}
         <div className={`flex items-center gap-2 mt-1.5 px-1 ${isUser ? 'flex-row-reverse' : ''}`}>
-          <span className={`text-xs ${isDarkMode ? 'text-apple-darkLabelTertiary' : 'text-apple-labelTertiary'}`}>
-            {formatTime(message.timestamp)}
-          </span>
+          {message.timestamp && (
+            <span className={`text-xs ${isDarkMode ? 'text-apple-darkLabelTertiary' : 'text-apple-labelTertiary'}`}>
+              {formatTime(message.timestamp)}
+            </span>
+          )}
 
-          {/* Rating (only for assistant) */}
-          {!isUser && (
+          {/* Rating (only for assistant, and not on read-only shared views) */}
+          {!isUser && onRate && (
             <motion.div 
               initial={{ opacity: 0 }}
               animate={{ opacity: showActions || message.rating ? 1 : 0 }}
               className="flex items-center gap-0.5"
             >
               <button
-                onClick={() => onRate(message.id, 'up')}
+                onClick={() => message.rating !== 'up' && onRate(message.id, 'up')}
                 className={`
                   p-1.5 rounded-lg transition-all duration-150 press-effect
                   ${message.rating === 'up' 
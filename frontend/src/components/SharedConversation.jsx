@@ -0,0 +1,76 @@
+import { useEffect, useState } from 'react'
+import Message from './Message'
+
+// Server snapshots have short ids; anything else is a conversation encoded into the URL
+const SHORT_SHARE_ID = /^[A-Za-z0-9_-]{16}$/
+
+const decodeSharedConversation = (encoded) => {
+  const data = JSON.parse(decodeURIComponent(atob(encoded)))
+  return { title: data.title, messages: data.messages }
+}
+
+const SharedConversation = ({ shareId, apiBaseUrl }) => {
+  const [conversation, setConversation] = useState(null)
+  const [error, setError] = useState(null)
+  const [isDarkMode] = useState(() => {
+    const saved = localStorage.getItem('theme')
+    if (saved) return saved === 'dark'
+    return window.matchMedia('(prefers-color-scheme: dark)').matches
+  })
+
+  useEffect(() => {
+    document.documentElement.classList.toggle('dark', isDarkMode)
+  }, [isDarkMode])
+
+  useEffect(() => {
+    if (!SHORT_SHARE_ID.test(shareId)) {
+      try {
+        setConversation(decodeSharedConversation(shareId))
+      } catch {
+        setError('This share link is invalid.')
+      }
+      return
+    }
+    fetch(`${apiBaseUrl}/share/${shareId}`)
+      .then(res => {
+        if (res.status === 404) throw new Error('This conversation is no longer shared.')
+        if (!res.ok) throw new Error('Failed to load the shared conversation.')
+        return res.json()
+      })
+      .then(data => setConversation({ title: data.title, messages: data.messages }))
+      .catch(err => setError(err.message))
+  }, [shareId, apiBaseUrl])
+
+  return (
+    <div className={`h-full overflow-y-auto ${isDarkMode ? 'bg-apple-darkBg' : 'bg-apple-bg'}`}>
+      <div className="max-w-3xl mx-auto px-4 py-8">
+        {error && (
+          <p className={`text-center text-sm ${isDarkMode ? 'text-apple-darkLabelSecondary' : 'text-apple-labelSecondary'}`}>
+            {error}
+          </p>
+        )}
+        {!error && !conversation && (
+          <p className={`text-center text-sm ${isDarkMode ? 'text-apple-darkLabelSecondary' : 'text-apple-labelSecondary'}`}>
+            Loading conversation...
+          </p>
+        )}
+        {conversation && (
+          <>
+            <h1 className={`text-xl font-semibold mb-6 ${isDarkMode ? 'text-apple-darkLabel' : 'text-apple-label'}`}>
+              {conversation.title || 'Shared conversation'}
+            </h1>
+            {conversation.messages.map((message, index) => (
+              <Message
+                key={index}
+                message={{ ...message, id: index, timestamp: message.created_at }}
+                isDarkMode={isDarkMode}
+              />
+            ))}
+          </>
+        )}
+      </div>
+    </div>
+  )
+}
+
+export default SharedConversation
@@ -1,11 +1,14 @@
 import React from 'react'
 import ReactDOM from 'react-dom/client'
-import App from './App.jsx'
+import App, { API_BASE_URL } from './App.jsx'
+import SharedConversation from './components/SharedConversation.jsx'
 import './index.css'
 
 ReactDOM.createRoot(document.getElementById('root')).render(
   <React.StrictMode>
-    <App />
+    {window.location.pathname.startsWith('/share/')
+      ? <SharedConversation shareId={window.location.pathname.slice('/share/'.length)} apiBaseUrl={API_BASE_URL} />
+      : <App />}
   </React.StrictMode>,
 )
 